@@ -1,11 +1,13 @@
-from collections import defaultdict
-import json
+import concurrent.futures
 import logging
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 
-from json_endec import GraphDecoder
+from event_log import EventLog
+import run_data
+from summary_cache import SummaryCache
+from transaction import State
 
 
 def plotCDF(data):
@@ -106,55 +108,117 @@ def timeBetweenTx(data):
     return between
 
 
-def loadData(data_dir):
-    """Loads data from files in data_dir into a list of dictionaries mapping tx id to list of times it took for miners to reach consensus for that tx, one dict for each run.
+def summarizeRun(events):
+    """Reduces a run's flat event columns to per-tx results with numpy group-by operations.
+
+    Arguments:
+        events {dict} -- Event columns of one run, grouped by tx id (see run_data.loadEvents).
+
+    Returns:
+        dict -- Maps tx id to a dictionary holding the tx's 'created' event, 'times' (the max time each miner took to reach consensus on it) and 'disconsensed' (list of [time after creation it was disconsensed, time until consensus again or -1]).
+    """
+
+    ids = events['tx_ids']
+    time_stamps = events['time_stamps']
+    miner_ids = events['miner_ids']
+    states = events['states']
+
+    # Every event is timed from the latest issue (creation) of its id before it; each id's events start with a creation.
+    created_positions = np.maximum.accumulate(np.where(states == State.CREATED.value, np.arange(len(ids)), 0))
+    elapsed = time_stamps - time_stamps[created_positions]
+
+    run_results = {}
+    for start, end in run_data.groupBounds(ids):
+        created = created_positions[end - 1]
+        miner_id = int(miner_ids[created])
+        run_results[int(ids[start])] = {
+            'created': (time_stamps[created].item(), None if miner_id == EventLog.NO_MINER else miner_id, State.CREATED.name),
+            'times': [],
+            'disconsensed': []
+        }
+
+    # Max time to consensus per (id, miner), never below 0.
+    consensus = np.flatnonzero(states == State.CONSENSUS.value)
+    consensus = consensus[np.lexsort((miner_ids[consensus], ids[consensus]))]
+    if len(consensus):
+        pair_starts = np.flatnonzero(np.r_[True, (np.diff(ids[consensus]) != 0) | (np.diff(miner_ids[consensus]) != 0)])
+        max_times = np.maximum(np.maximum.reduceat(elapsed[consensus], pair_starts), 0).tolist()
+        for tx_id, max_time in zip(ids[consensus[pair_starts]].tolist(), max_times):
+            run_results[tx_id]['times'].append(max_time)
+
+    # A disconsensus ends at the id's next consensus event, unless another disconsensus comes first.
+    changes = np.flatnonzero((states == State.CONSENSUS.value) | (states == State.DISCONSENSED.value))
+    for k in np.flatnonzero(states[changes] == State.DISCONSENSED.value).tolist():
+        disc = changes[k]
+        duration = -1
+        if k + 1 < len(changes):
+            after = changes[k + 1]
+            if ids[after] == ids[disc] and states[after] == State.CONSENSUS.value and 0 < time_stamps[disc] < time_stamps[after]:
+                duration = (time_stamps[after] - time_stamps[disc]).item()
+        run_results[int(ids[disc])]['disconsensed'].append([elapsed[disc].item(), duration])
+    return run_results
+
+
+def loadRunResults(fname, load_graph=False):
+    """Loads one run's data file and reduces it (see summarizeRun).
+
+    Arguments:
+        fname {str} -- File name of data written by Simulation.writeData.
+
+    Keyword Arguments:
+        load_graph {bool} -- Whether to rebuild the run's graph. (default: {False})
+
+    Returns:
+        (networkx.Graph|None, dict) -- The run's graph (None unless load_graph) and its per-tx results.
+    """
+
+    graph, events = run_data.loadEvents(fname, load_graph)
+    return graph, summarizeRun(events)
+
+
+def loadData(data_dir, load_graphs=False, workers=None, use_cache=True):
+    """Loads data from files (.json or .npz) in data_dir into a list of dictionaries mapping tx id to list of times it took for miners to reach consensus for that tx, one dict for each run.
+    Files without a valid entry in the directory's summary cache are loaded in parallel worker processes and added to the cache.
 
     Arguments:
         data_dir {str} -- Directory where data files should be loaded from.
 
+    Keyword Arguments:
+        load_graphs {bool} -- Whether to rebuild each run's graph; None is returned in its place otherwise. (default: {False})
+        workers {int} -- Number of worker processes, or None for one per core. (default: {None})
+        use_cache {bool} -- Whether to reuse and update the summary cache (see SummaryCache). (default: {True})
+
     Returns:
         {list((networkx.Graph, dict))} -- List of (graph, dictionary) tuples--one tuple for each run--in which the dictionary maps tx id to a (event, list) tuple of the tx's creation and times it took for miners to reach consensus for that tx.
     """
 
-    raw_data = []
-    for fname in os.listdir(data_dir):
-        if not fname.endswith('.json'):
-            continue
-        with open(data_dir+fname, 'r') as infile:
-            raw_data.append(json.load(infile, cls=GraphDecoder))
-    if not raw_data:
+    fnames = [data_dir+fname for fname in sorted(os.listdir(data_dir)) if fname.endswith('.json') or fname.endswith('.npz')]
+    if not fnames:
         return
 
-    data = []
-    for run in raw_data:
-        run_results = defaultdict(dict)
-        for tx_id_str in run['tx_histories']:
-            history = run['tx_histories'][tx_id_str]
-            tx_id = int(tx_id_str)
-            max_times = defaultdict(int)
-            last_disc = -1
-            disconsensed = []
-            created = None
-            for event in history:  # Event is [time_step, miner_id, transaction.State].
-                if event[2] == 'CREATED':
-                    created = event
-                    continue
-                elif event[2] == 'DISCONSENSED':
-                    assert created is not None
-                    disconsensed.append([event[0] - created[0], -1])
-                    last_disc = event[0]
-                    continue
-                elif event[2] != 'CONSENSUS':
-                    continue
-                if last_disc > 0:
-                    if event[0] > last_disc:  # Sequence of chronologically ordered events is broken when another history is appended.
-                        disconsensed[-1][1] = event[0] - last_disc
-                    last_disc = -1
-                elapsed = event[0] - created[0]
-                if max_times[event[1]] < elapsed:
-                    max_times[event[1]] = elapsed
-            run_results[tx_id]['created'] = created
-            run_results[tx_id]['times'] = max_times.values()
-            run_results[tx_id]['disconsensed'] = disconsensed
-        data.append((run['graph'], run_results))
-    return data
+    cache = SummaryCache(data_dir) if use_cache else None
+    summaries = {}
+    graphs = {}
+    to_load = []
+    for fname in fnames:
+        summary = cache.get(fname) if cache else None
+        if summary is None:
+            to_load.append(fname)
+        else:
+            summaries[fname] = summary
+            graphs[fname] = run_data.loadGraph(fname) if load_graphs else None
+
+    if workers == 1 or len(to_load) <= 1:
+        loaded = [loadRunResults(fname, load_graphs) for fname in to_load]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            loaded = list(executor.map(loadRunResults, to_load, [load_graphs] * len(to_load)))
+    for fname, (graph, summary) in zip(to_load, loaded):
+        graphs[fname] = graph
+        summaries[fname] = summary
+        if cache:
+            cache.put(fname, summary)
+
+    if cache:
+        cache.save(fnames)
+    return [(graphs[fname], summaries[fname]) for fname in fnames]
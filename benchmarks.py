@@ -0,0 +1,407 @@
+import datetime
+import gc
+import json
+import logging
+import math
+import networkx as nx
+import numpy
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import timeit
+
+import analysis
+from miner import Message, Type
+from simulation import Simulation
+from simulation_settings import OutputFormat, SimulationSettings
+
+SEED = 1  # Every benchmark reseeds with this before each repetition, so all repetitions (and commits) do the same work.
+AVERAGE_DEGREE = 10  # Geometric graphs get the radius that gives their miners about this many neighbors.
+TRANSACTIONS = {100: 100, 2000: 30, 20000: 10}  # Transactions generated by the end-to-end runs at each scale (10 at scales not listed).
+FIXTURE_MINERS = 100  # Size of the runs replayed by the chain micro-benchmarks.
+FIXTURE_TRANSACTIONS = 300
+
+
+def settingsData(protocol_type, number_of_miners, transactions):
+    """
+    Arguments:
+        protocol_type {str} -- Name of the protocol (BITCOIN or IOTA).
+        number_of_miners {int} -- Number of miners.
+        transactions {int} -- Number of transactions to generate.
+
+    Returns:
+        dict -- Settings of a benchmark run, in the same form as a settings file.
+    """
+
+    protocol = {'type': protocol_type, 'targetTicksBetweenGeneration': 100}
+    if protocol_type == 'BITCOIN':
+        protocol['acceptDepth'] = 6
+    return {
+        'threadWorkers': 1,
+        'numberOfExecutions': 1,
+        'seed': SEED,
+        'topologySelection': 'GENERATE_ONCE',
+        'terminationCondition': 'NUMBER_OF_GENERATED_TRANSACTIONS',
+        'terminationValue': transactions,
+        'minerPower': {'type': 'CONSTANT', 'value': 1},
+        'topology': {
+            'type': 'GEOMETRIC_UNIFORM_DELAY',
+            'numberOfMiners': number_of_miners,
+            'radius': math.sqrt(AVERAGE_DEGREE / (math.pi * number_of_miners)),
+            'connectivity': 'BRIDGE',  # Always one attempt, so the graph takes the same work to generate at every scale.
+            'networkDelay': {'type': 'EXPONENTIAL', 'beta': 1.0}
+        },
+        'protocol': protocol
+    }
+
+
+def seedRandom():
+    """Seeds both random number generators used by the simulation with SEED.
+    """
+
+    random.seed(SEED)
+    numpy.random.seed(SEED)
+
+
+def runSeeded(settings):
+    """
+    Arguments:
+        settings {SimulationSettings} -- Settings of the run.
+
+    Returns:
+        Simulation -- Completed simulation, generated and run from SEED.
+    """
+
+    seedRandom()
+    simulation = Simulation(settings, settings.topology.generateMinerGraph(), 0, SEED)
+    simulation.runSimulation()
+    return simulation
+
+
+def result(name, params, times, count=1, **extra):
+    """
+    Arguments:
+        name {str} -- What was timed.
+        params {dict} -- What it was timed on.
+        times {list(float)} -- Seconds taken by each repetition.
+
+    Keyword Arguments:
+        count {int} -- Number of calls timed by each repetition; per-call times are the repetition's time divided by this. (default: {1})
+        **extra -- Other facts about the benchmark to record (e.g. how much work it did).
+
+    Returns:
+        dict -- Machine-readable result.
+    """
+
+    per_call = sorted(time / count for time in times)
+    entry = {
+        'name': name,
+        'params': params,
+        'count': count,
+        'times': times,
+        'best': per_call[0],
+        'median': per_call[len(per_call) // 2]
+    }
+    entry.update(extra)
+    logging.info("%s %s: best %.6gs, median %.6gs per call" % (name, json.dumps(params, sort_keys=True), entry['best'], entry['median']))
+    return entry
+
+
+def timeRepeated(function, repeat):
+    """
+    Arguments:
+        function {function} -- Function to time; called with no arguments.
+        repeat {int} -- Number of times to call it.
+
+    Returns:
+        list(float) -- Seconds taken by each call.
+    """
+
+    times = []
+    for _ in xrange(repeat):
+        gc.collect()  # Don't charge one repetition for the garbage of the previous one.
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+    return times
+
+
+def benchmarkRunSimulation(protocol_type, number_of_miners, repeat):
+    """Times Simulation.runSimulation end to end (setup is timed separately).
+
+    Arguments:
+        protocol_type {str} -- Name of the protocol.
+        number_of_miners {int} -- Number of miners.
+        repeat {int} -- Number of repetitions.
+
+    Returns:
+        (dict, Simulation) -- The result and the last completed simulation.
+    """
+
+    settings = SimulationSettings(settingsData(protocol_type, number_of_miners, TRANSACTIONS.get(number_of_miners, 10)))
+    seedRandom()
+    graph = settings.topology.generateMinerGraph()
+    times = []
+    setup_times = []
+    simulation = None
+    for _ in xrange(repeat):
+        simulation = None
+        gc.collect()
+        seedRandom()
+        start = timeit.default_timer()
+        simulation = Simulation(settings, graph, 0, SEED)
+        setup_times.append(timeit.default_timer() - start)
+        start = timeit.default_timer()
+        simulation.runSimulation()
+        times.append(timeit.default_timer() - start)
+    params = {'protocol': protocol_type, 'miners': number_of_miners, 'transactions': settings.termination_value}
+    entry = result('Simulation.runSimulation', params, times, setup_times=setup_times, edges=graph.number_of_edges(), ticks=simulation.tick, tx=len(simulation.all_tx), events=len(simulation.event_log))
+    return entry, simulation
+
+
+def benchmarkGenerateMinerGraph(number_of_miners, repeat):
+    """
+    Arguments:
+        number_of_miners {int} -- Number of miners.
+        repeat {int} -- Number of repetitions.
+
+    Returns:
+        dict -- Result of timing TopologySettings.generateMinerGraph (without a topology cache).
+    """
+
+    settings = SimulationSettings(settingsData('BITCOIN', number_of_miners, 1))
+
+    def generate():
+        seedRandom()
+        settings.topology.generateMinerGraph()
+
+    return result('TopologySettings.generateMinerGraph', {'miners': number_of_miners}, timeRepeated(generate, repeat))
+
+
+def benchmarkWriteData(simulation, output_format, out_dir, repeat):
+    """
+    Arguments:
+        simulation {Simulation} -- Completed simulation; its settings' output format is changed.
+        output_format {OutputFormat} -- Format to write.
+        out_dir {str} -- Directory to write to.
+        repeat {int} -- Number of repetitions.
+
+    Returns:
+        dict -- Result of timing Simulation.writeData.
+    """
+
+    simulation.settings.output_format = output_format
+    fname = os.path.join(out_dir, 'data0.%s' % output_format.name.lower())
+
+    def write():
+        simulation.json_data = None  # Otherwise only the first repetition would condense the histories.
+        simulation.writeData(fname)
+
+    times = timeRepeated(write, repeat)
+    params = {'format': output_format.name, 'miners': len(simulation.miners)}
+    return result('Simulation.writeData', params, times, events=len(simulation.event_log), bytes=os.path.getsize(fname))
+
+
+def benchmarkLoadData(data_dir, output_format, miners, use_cache, repeat):
+    """
+    Arguments:
+        data_dir {str} -- Directory holding the data file written by benchmarkWriteData, with a trailing slash.
+        output_format {OutputFormat} -- Format of the data files.
+        miners {int} -- Number of miners in the runs, to record.
+        use_cache {bool} -- Whether to time loading through a warm summary cache instead of parsing every file.
+        repeat {int} -- Number of repetitions.
+
+    Returns:
+        dict -- Result of timing analysis.loadData in one process.
+    """
+
+    if use_cache:
+        analysis.loadData(data_dir, workers=1)  # Warms the cache.
+    times = timeRepeated(lambda: analysis.loadData(data_dir, workers=1, use_cache=use_cache), repeat)
+    params = {'format': output_format.name, 'miners': miners, 'cached': use_cache}
+    return result('analysis.loadData', params, times)
+
+
+def benchmarkPopMsg(simulation, repeat, batch=1000, msgs_per_tick=10):
+    """Times Miner.popMsg handing over messages that are due, on a completed simulation's first miner.
+
+    Arguments:
+        simulation {Simulation} -- Completed simulation.
+        repeat {int} -- Number of repetitions.
+
+    Keyword Arguments:
+        batch {int} -- Number of calls per repetition, each on its own tick. (default: {1000})
+        msgs_per_tick {int} -- Messages arriving on each of those ticks. (default: {10})
+
+    Returns:
+        dict -- Result.
+    """
+
+    miner = simulation.miners[simulation.graphNodes()[0]]
+    tx = simulation.all_tx[-1]
+    now = simulation.tick
+    times = []
+    for _ in xrange(repeat):
+        simulation.tick = now
+        for delay in xrange(1, batch + 1):
+            for _ in xrange(msgs_per_tick):
+                miner.pushMsg(Message(0, Type.BLOCK, tx), delay)
+        gc.collect()
+        start = timeit.default_timer()
+        for tick in xrange(now + 1, now + batch + 1):
+            simulation.tick = tick
+            miner.popMsg()
+        times.append(timeit.default_timer() - start)
+        for tick in xrange(now + 1, now + batch + 1):
+            simulation.arrivals.pop(tick, None)  # Nothing runs those ticks, so drop the miner from their worklists.
+    simulation.tick = now
+    return result('Miner.popMsg', {'msgs_per_tick': msgs_per_tick}, times, count=batch)
+
+
+def replayChain(simulation):
+    """Feeds every tx of a completed simulation, in creation order, to a new miner through addToChain, checking all tx after each one like a miner that receives them does.
+
+    Arguments:
+        simulation {Simulation} -- Completed simulation (it gets an extra miner).
+
+    Returns:
+        (float, float, int) -- Seconds spent in addToChain, seconds spent in checkAllTx, and number of tx replayed.
+    """
+
+    miner = simulation.protocol.getMinerClass()(len(simulation.miners), simulation.all_tx[0], simulation.graph, simulation)
+    add_time = check_time = 0.0
+    timer = timeit.default_timer
+    for tx in simulation.all_tx[1:]:
+        start = timer()
+        miner.addToChain(tx, tx.origin)
+        added = timer()
+        miner.checkAllTx()
+        check_time += timer() - added
+        add_time += added - start
+    return add_time, check_time, len(simulation.all_tx) - 1
+
+
+def benchmarkChain(protocol_type, repeat):
+    """Times addToChain and checkAllTx by replaying the chain of a fixture run (see replayChain).
+
+    Arguments:
+        protocol_type {str} -- Name of the protocol.
+        repeat {int} -- Number of repetitions.
+
+    Returns:
+        (list(dict), Simulation) -- The results (addToChain only for Bitcoin, since Iota inherits it) and the fixture simulation.
+    """
+
+    simulation = runSeeded(SimulationSettings(settingsData(protocol_type, FIXTURE_MINERS, FIXTURE_TRANSACTIONS)))
+    class_name = simulation.protocol.getMinerClass().__name__
+    add_times = []
+    check_times = []
+    for _ in xrange(repeat):
+        gc.collect()
+        add_time, check_time, count = replayChain(simulation)
+        add_times.append(add_time)
+        check_times.append(check_time)
+    params = {'protocol': protocol_type, 'miners': FIXTURE_MINERS, 'transactions': FIXTURE_TRANSACTIONS}
+    entries = [result('%s.checkAllTx' % class_name, params, check_times, count=count)]
+    if protocol_type == 'BITCOIN':
+        entries.insert(0, result('%s.addToChain' % class_name, params, add_times, count=count))
+    return entries, simulation
+
+
+def gitCommit():
+    """
+    Returns:
+        str|None -- Hash of the checked out commit (with -dirty appended if there are uncommitted changes), or None if it can't be determined.
+    """
+
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT).strip()
+        if subprocess.call(['git', 'diff', '--quiet', 'HEAD']) != 0:
+            commit += '-dirty'
+        return commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runBenchmarks(scales, repeat=3):
+    """Runs the whole suite: end-to-end runs of both protocols, graph generation, writing and loading data at each scale, and the micro-benchmarks.
+
+    Arguments:
+        scales {list(int)} -- Numbers of miners to run the scaled benchmarks at.
+
+    Keyword Arguments:
+        repeat {int} -- Number of repetitions of each benchmark; its best and median are recorded. (default: {3})
+
+    Returns:
+        dict -- Machine-readable report (see compareReports).
+    """
+
+    results = []
+    out_dir = tempfile.mkdtemp(prefix='benchmark')
+    try:
+        for number_of_miners in scales:
+            results.append(benchmarkGenerateMinerGraph(number_of_miners, repeat))
+            entry, simulation = benchmarkRunSimulation('IOTA', number_of_miners, repeat)
+            results.append(entry)
+            simulation = None  # Frees it before the next run.
+            entry, simulation = benchmarkRunSimulation('BITCOIN', number_of_miners, repeat)
+            results.append(entry)
+            for output_format in [OutputFormat.NPZ, OutputFormat.JSON]:  # The Bitcoin run's data, since it has more events (reissues).
+                data_dir = os.path.join(out_dir, '%s_%d' % (output_format.name.lower(), number_of_miners), '')
+                results.append(benchmarkWriteData(simulation, output_format, data_dir, repeat))
+                for use_cache in [False, True]:
+                    results.append(benchmarkLoadData(data_dir, output_format, number_of_miners, use_cache, repeat))
+            simulation = None
+
+        for protocol_type in ['BITCOIN', 'IOTA']:
+            entries, simulation = benchmarkChain(protocol_type, repeat)
+            results.extend(entries)
+        results.append(benchmarkPopMsg(simulation, repeat))
+    finally:
+        shutil.rmtree(out_dir)
+
+    return {
+        'commit': gitCommit(),
+        'date': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'networkx': nx.__version__,
+        'platform': platform.platform(),
+        'seed': SEED,
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def resultKey(entry):
+    """
+    Arguments:
+        entry {dict} -- Result of a benchmark.
+
+    Returns:
+        str -- Identifies the benchmark across reports (name and params).
+    """
+
+    return '%s %s' % (entry['name'], json.dumps(entry['params'], sort_keys=True))
+
+
+def compareReports(old, new):
+    """
+    Arguments:
+        old {dict} -- Report of the baseline (see runBenchmarks).
+        new {dict} -- Report to compare with it.
+
+    Returns:
+        list((str, float, float)) -- For each benchmark in both reports: its key, and its best time in new divided by its best time in old (below 1 is faster) and likewise for the median.
+    """
+
+    old_results = {resultKey(entry): entry for entry in old['results']}
+    comparison = []
+    for entry in new['results']:
+        key = resultKey(entry)
+        if key in old_results and old_results[key]['best'] > 0 and old_results[key]['median'] > 0:
+            comparison.append((key, entry['best'] / old_results[key]['best'], entry['median'] / old_results[key]['median']))
+    return comparison
@@ -0,0 +1,41 @@
+class Bitset:
+    """Growable set of non-negative integers stored as packed bits (one bit per possible member).
+    """
+
+    def __init__(self):
+        self.bits = bytearray()
+
+    def add(self, index):
+        """Adds index to the set, growing the underlying storage if needed.
+
+        Arguments:
+            index {int} -- Integer to add.
+        """
+
+        byte = index >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytearray(max(byte + 1 - len(self.bits), len(self.bits))))  # Grow geometrically.
+        self.bits[byte] |= 1 << (index & 7)
+
+    def __contains__(self, index):
+        """
+        Arguments:
+            index {int} -- Integer to look for.
+
+        Returns:
+            bool -- True if index is in the set, False otherwise.
+        """
+
+        byte = index >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (index & 7) & 1)
+
+    def discard(self, index):
+        """Removes index from the set if it is in it.
+
+        Arguments:
+            index {int} -- Integer to remove.
+        """
+
+        byte = index >> 3
+        if byte < len(self.bits):
+            self.bits[byte] &= ~(1 << (index & 7)) & 0xff
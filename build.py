@@ -1,54 +1,123 @@
 import concurrent.futures
-import copy
+import hashlib
+import json
 import logging
+import numpy
+import os
 from pynt import task
+import random
 import sys
 import time
+import unittest
 
 sys.path.append('.')
 import analysis
+import benchmarks
+import memory_usage
 import plot
-from simulation_settings import SimulationSettings, TopologySelection
+from simulation_settings import ExecutionMode, NetworkRepresentation, SimulationSettings, TopologySelection
 from simulation import Simulation
+from topology_cache import TopologyCache
 import transaction
 
 # Setup logging.
 logging.basicConfig(level=logging.DEBUG)
 
+shared_graph = None  # runMonteCarlo's GENERATE_ONCE graph; forked worker processes inherit it instead of getting a pickled copy for every run.
 
-def runOnce(settings, graph, thread_id=0):
+
+def seedRandom(seed):
+    """Seeds both random number generators used by the simulation (Python's random and numpy.random).
+
+    Arguments:
+        seed {int} -- Seed; must be between 0 and 2**32 - 1.
+    """
+
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+
+def topologySeed(seed):
+    """Derives the seed to generate a run's graph with from the run's seed.
+    Generating with the run's own seed would make the run replay the draws that placed its miners.
+
+    Arguments:
+        seed {int|None} -- Seed of the run.
+
+    Returns:
+        int|None -- Seed for generateGraph, between 0 and 2**32 - 1; None if seed is None.
+    """
+
+    if seed is None:
+        return None
+    return int(hashlib.md5('topology %d' % seed).hexdigest()[:8], 16)
+
+
+def generateGraph(settings, seed=None):
+    """Generates the miner graph, going through the settings' topology cache if there is one.
+    The graph is a Network if the settings use the CSR network representation.
+
+    Arguments:
+        settings {SimulationSettings} -- Settings for the simulation.
+
+    Keyword Arguments:
+        seed {int} -- Seed for the random number generators, or None to leave them as they are (generated graphs are then not cached). (default: {None})
+
+    Returns:
+        networkx.Graph|Network -- Graph of the miners.
+    """
+
+    if seed is not None:
+        seedRandom(seed)
+    cache = None
+    if settings.topology_cache is not None:
+        cache = TopologyCache(settings.topology_cache)
+    if settings.network_representation == NetworkRepresentation.CSR:
+        return settings.topology.generateMinerNetwork(cache, seed)
+    return settings.topology.generateMinerGraph(cache, seed)
+
+
+def runOnce(settings, graph, thread_id=0, seed=None):
     """Execute a single run of the simulation.
 
     Arguments:
         settings {SimulationSettings} -- Settings for the simulation.
-        graph {networkx.Graph} -- Graph of the miners.
+        graph {networkx.Graph|Network} -- Graph of the miners.
 
     Keyword Arguments:
         thread_id {int} -- The thread number of this run of the simulation. (default: {0})
+        seed {int} -- Seed for the random number generators, or None to leave them as they are. (default: {None})
 
     Returns:
         Simulation -- Completed simulation object.
     """
 
-    simulation = Simulation(settings, graph, thread_id)
+    if seed is not None:
+        seedRandom(seed)
+    simulation = Simulation(settings, graph, thread_id, seed)
     simulation.runSimulation()
     return simulation
 
 
-def runThreaded(settings, graph, thread_id, out_dir):
-    """Runs the simulation once, directing output to a thread-unique file. Intended to be used as the thread's target function.
+def runThreaded(settings, graph, thread_id, out_dir, seed=None):
+    """Runs the simulation once, directing output to a thread-unique file. Intended to be used as the thread's (or worker process') target function.
 
     Arguments:
         settings {SimulationSettings} -- Stores all settings for the run.
-        graph {networkx.Graph} -- Graph object to run the simulation on; should have edge delays.
+        graph {networkx.Graph|Network|None} -- Graph object to run the simulation on; should have edge delays. None uses shared_graph.
         thread_id {int} -- The thread number of this run of the simulation.
         out_dir {string} -- The directory where output should be written.
+
+    Keyword Arguments:
+        seed {int} -- Seed for the random number generators, or None to leave them as they are. (default: {None})
     """
 
     assert out_dir[-1] == '/'
-    logging.debug('Started thread %d' % thread_id)
-    out_file = "%sdata%d.json" % (out_dir, thread_id)
-    simulation = runOnce(settings, graph, thread_id)
+    logging.debug('Started thread %d (seed %s)' % (thread_id, seed))
+    out_file = "%sdata%d.%s" % (out_dir, thread_id, settings.output_format.name.lower())
+    if graph is None:
+        graph = shared_graph
+    simulation = runOnce(settings, graph, thread_id, seed)
     simulation.writeData(out_file)
     logging.debug('Finished thread %d' % thread_id)
 
@@ -56,41 +125,70 @@ def runThreaded(settings, graph, thread_id, out_dir):
 @task()
 def runMonteCarlo(file='sim.json', out_dir='./out/'):
     """Runs a number of Monte Carlo simulations according to settings loaded from file.
+    Every run gets its own seed, drawn from the settings' seed (or a fresh one, which is logged), so any run can be reproduced.
+    Runs only read the settings and graph, so nothing is copied for them (except to send them to worker processes).
+    Raises an exception naming the failed runs if any run fails.
 
     Keyword Arguments:
         file {str} -- File name to load settings from. (default: {'sim.json'})
         out_dir {str} -- Directory name to write output to. (default: {'./out/'})
     """
 
+    global shared_graph
     settings = SimulationSettings(file)
+    seed = settings.seed
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2**32 - 1)
+    logging.info("Seed: %d" % seed)
+    seeder = random.Random(seed)
+
     if settings.topology_selection == TopologySelection.GENERATE_ONCE:
-        single_graph = settings.topology.generateMinerGraph()
+        shared_graph = generateGraph(settings, seed)
+    if settings.execution_mode == ExecutionMode.PROCESSES:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=settings.process_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=settings.thread_workers)
     start = time.time()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=settings.thread_workers) as executor:
+    futures = {}
+    with executor:
         for thread_id in range(0, settings.number_of_executions):
+            run_seed = seeder.randint(0, 2**32 - 1)
             if settings.topology_selection == TopologySelection.GENERATE_EACH_TIME:
-                graph = settings.topology.generateMinerGraph()
+                graph = generateGraph(settings, topologySeed(run_seed))  # Derived from the run's seed, so each graph can be reproduced (and cached) on its own without sharing draws with the run.
+            elif settings.execution_mode == ExecutionMode.PROCESSES and hasattr(os, 'fork'):
+                graph = None  # Workers are forked after shared_graph is set, so they already have it.
             else:
-                graph = copy.deepcopy(single_graph)  # graph.copy() wasn't deepcopying miner objects attached to nodes.
-            thread_settings = copy.deepcopy(settings)
-            executor.submit(runThreaded, thread_settings, graph, thread_id, out_dir)
+                graph = shared_graph
+            futures[executor.submit(runThreaded, settings, graph, thread_id, out_dir, run_seed)] = thread_id
+
+        failed = []
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                logging.exception("Run %d failed" % futures[future])
+                failed.append(futures[future])
     logging.info("Time: %f" % (time.time() - start))
+    if failed:
+        raise Exception("%d of %d runs failed: %s" % (len(failed), settings.number_of_executions, sorted(failed)))
 
 
 @task()
-def run(file='sim.json', out='./out/data.json'):
+def run(file='sim.json', out=None):
     """Executes one simulation.
 
     Keyword Arguments:
         file {str} -- File name to load settings from. (default: {'sim.json'})
-        out {str} -- File name to store output to. (default: {'./out/data.json'})
+        out {str} -- File name to store output to; ./out/data.json or ./out/data.npz depending on the output format if None. (default: {None})
     """
 
     settings = SimulationSettings(file)
-    graph = settings.topology.generateMinerGraph()
+    if out is None:
+        out = './out/data.%s' % settings.output_format.name.lower()
+    graph = generateGraph(settings, topologySeed(settings.seed))
     logging.info("Starting simulation")
     start = time.time()
-    simulation = runOnce(settings, graph)
+    simulation = runOnce(settings, graph, seed=settings.seed)
 
     simulation.writeData(out)
     logging.info("Simulation time: %f" % (time.time() - start))
@@ -98,45 +196,47 @@ def run(file='sim.json', out='./out/data.json'):
 
 
 @task()
-def runWithDebug(file='sim.json', out='./out/data.json'):
+def runWithDebug(file='sim.json', out=None):
     """Executes one simulation and analyzes resulting data, including some debug functions
 
     Keyword Arguments:
         file {str} -- File name to load settings from. (default: {'sim.json'})
-        out {str} -- File name to store output to. (default: {'./out/data.json'})
+        out {str} -- File name to store output to; ./out/data.json or ./out/data.npz depending on the output format if None. (default: {None})
     """
 
     settings = SimulationSettings(file)
-    graph = settings.topology.generateMinerGraph()
+    if out is None:
+        out = './out/data.%s' % settings.output_format.name.lower()
+    graph = generateGraph(settings)
     logging.info("Starting simulation")
     start = time.time()
     simulation = runOnce(settings, graph)
 
     # DEBUG
-    g = simulation.graph
     allMinerIds = set()
     allMiners = []
-    for n in g.nodes:
-        m = g.nodes[n]['miner']
+    for n in simulation.graphNodes():
+        m = simulation.miners[n]
         allMinerIds.add(m.id)
         allMiners.append(m)
     unconsensed_tx = []  # Consensed by 1 or more but not all miners.
     miners_to_compare = set([0])  # Set of miners to display if some tx are unconsensed (always includes 0 for reference).
+    final_states = [{} for _ in simulation.all_tx]  # Maps tx index to each miner's latest state code for that tx.
+    for _, miner_id, tx_index, state in simulation.event_log:
+        final_states[tx_index][miner_id] = state
     for t in simulation.all_tx:
-        states = {}
-        for e in t.history:
-            states[e.miner_id] = e.state
-        s = set([i for i in states if states[i] == transaction.State.CONSENSUS])  # Have to do it like this to capture FINAL state, not just "was this ever in consensus".
+        states = final_states[t.index]
+        s = set([i for i in states if states[i] == transaction.State.CONSENSUS.value])  # Have to do it like this to capture FINAL state, not just "was this ever in consensus".
         if s and allMinerIds - s:
             miners_to_compare |= set(list(s)[:1])
             unconsensed_tx.append(t)
     if unconsensed_tx:
         print "Consensus has still not been reached for some tx:", [t.id for t in unconsensed_tx]
         print miners_to_compare
-        plot.plotAllDags([g.nodes[i]['miner'] for i in miners_to_compare])
+        plot.plotAllDags([simulation.miners[i] for i in miners_to_compare])
     else:
         print "All tx consensed!"
-    plot.plotDag(simulation.graph.nodes[0]['miner'])
+    plot.plotDag(simulation.miners[0])
     # END DEBUG
 
     simulation.writeData(out)
@@ -159,6 +259,65 @@ def analyze(data_dir='./out/'):
     analysis.reportDisconsensed(data)
 
 
+@task()
+def measureMemory(file='sim.json'):
+    """Executes one simulation and reports the memory used per tx and per in-flight message.
+
+    Keyword Arguments:
+        file {str} -- File name to load settings from. (default: {'sim.json'})
+    """
+
+    settings = SimulationSettings(file)
+    graph = generateGraph(settings, topologySeed(settings.seed))
+    simulation = runOnce(settings, graph, seed=settings.seed)
+    sizes = memory_usage.measureSimulation(simulation)
+    logging.info("Bytes per tx: %.1f (tx) + %.1f (DAG node), over %d tx" % (sizes['tx_bytes'], sizes['dag_node_bytes'], sizes['tx_count']))
+    logging.info("Bytes per in-flight message: %d (block), %d (request)" % (sizes['block_msg_bytes'], sizes['request_msg_bytes']))
+
+
+@task()
+def benchmark(scales='100,2000,20000', repeat=3, out='./benchmark.json'):
+    """Runs the benchmark suite (see benchmarks.runBenchmarks) with fixed seeds and writes its results as JSON, so they can be compared across commits.
+
+    Keyword Arguments:
+        scales {str} -- Comma-separated numbers of miners to run the scaled benchmarks at. (default: {'100,2000,20000'})
+        repeat {int} -- Number of repetitions of each benchmark. (default: {3})
+        out {str} -- File name to write the results to. (default: {'./benchmark.json'})
+    """
+
+    report = benchmarks.runBenchmarks([int(scale) for scale in str(scales).split(',')], int(repeat))
+    with open(out, 'w') as outfile:
+        json.dump(report, outfile, indent=1, sort_keys=True)
+    logging.info("Wrote %d benchmark results to %s" % (len(report['results']), out))
+
+
+@task()
+def compareBenchmarks(old, new):
+    """Reports how each benchmark's time changed between two results files written by the benchmark task.
+
+    Arguments:
+        old {str} -- File name of the baseline results.
+        new {str} -- File name of the results to compare with them.
+    """
+
+    with open(old, 'r') as infile:
+        old_report = json.load(infile)
+    with open(new, 'r') as infile:
+        new_report = json.load(infile)
+    logging.info("Comparing %s (%s) with %s (%s); ratios below 1 are faster" % (new, new_report['commit'], old, old_report['commit']))
+    for key, best_ratio, median_ratio in benchmarks.compareReports(old_report, new_report):
+        logging.info("%.3fx best, %.3fx median: %s" % (best_ratio, median_ratio, key))
+
+
+@task()
+def test():
+    """Runs the unit tests in tests/.
+    """
+
+    suite = unittest.defaultTestLoader.discover('tests', top_level_dir='.')
+    if not unittest.TextTestRunner(verbosity=2).run(suite).wasSuccessful():
+        raise Exception("Tests failed.")
+
 
 # Sets the default task.
 __DEFAULT__ = run
@@ -0,0 +1,22 @@
+class Node(object):
+    """Node of the simulation-wide DAG of every tx, shared by all miners; each miner only keeps track of which nodes are in its own view of the blockchain.
+    Nothing about a node changes once it is created, except that children are appended as they are created.
+    """
+
+    __slots__ = ('tx', 'parents', 'children', 'depth', 'ancestors')
+
+    def __init__(self, tx, parents):
+        """Links the node below its parents.
+
+        Arguments:
+            tx {Tx} -- The transaction that the node represents.
+            parents {list(Node)} -- Nodes of the tx's pointers, in pointer order.
+        """
+
+        self.tx = tx
+        self.parents = parents
+        self.children = []  # Every child in the order they were created; a miner has to skip the ones that aren't in its view.
+        self.depth = max(parent.depth for parent in parents) + 1 if parents else 0  # Used by Bitcoin, not Iota.
+        self.ancestors = None if parents else 0  # Used by Iota, not Bitcoin: bitset of the tx indexes of all of the node's ancestors, filled in the first time a miner connects the node.
+        for parent in parents:
+            parent.children.append(self)
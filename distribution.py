@@ -1,5 +1,6 @@
 from enum import Enum
 import math
+import numpy
 from numpy import random
 from pprint import pformat
 
@@ -17,8 +18,13 @@ class DistributionType(Enum):
 
 class Distribution:
     """Allows for sampling from different types of probabilistic distributions.
+
+    Scalar samples are served from a buffer of pre-drawn samples that is refilled in blocks of BUFFER_SIZE.
+    The samples have the same distribution as drawing one at a time, but a refill takes a whole block from numpy's global random state at once, so other draws interleaved with these (e.g. another non-constant distribution, or tx generation) get different numbers: seeded runs with non-constant miner power or delays don't reproduce runs from before the buffer was added.
     """
 
+    BUFFER_SIZE = 4096
+
     def __init__(self, settings):
         """Parses the settings in the value parameter.
 
@@ -39,17 +45,17 @@ class Distribution:
             self.value = settings['value']
         else:
             raise NotImplementedError("Distribution type not yet implemented")
+        self.buffer = []
+        self.buffer_index = 0
 
-    def sample(self, size=None):
-        """Samples from the distribution
+    def draw(self, size):
+        """Draws raw (unquantized) samples from the distribution.
 
-        Keyword Arguments:
-            size {int or tuple of ints} -- Output shape. If the given shape is, e.g., (m, n, k), then m * n * k samples are drawn.
-            If size is None (default), a single value is returned if loc and scale are both scalars. Otherwise,
-            np.broadcast(loc, scale).size samples are drawn. (default: {None})
+        Arguments:
+            size {int or tuple of ints} -- Output shape.
 
         Returns:
-            ndarray or scalar -- Drawn samples from the parameterized distribution.
+            ndarray -- Drawn samples from the parameterized distribution.
         """
 
         if self.distribution_type == DistributionType.UNIFORM:
@@ -59,19 +65,60 @@ class Distribution:
         elif self.distribution_type == DistributionType.LAPLACIAN:
             return random.laplace(self.average, self.standard_deviation, size)
         elif self.distribution_type == DistributionType.EXPONENTIAL:
-            return int(math.ceil(random.exponential(self.beta)))
+            return random.exponential(self.beta, size)
         elif self.distribution_type == DistributionType.CONSTANT:
-            return self.value
+            return numpy.full(size, self.value)
         else:
             raise NotImplementedError("Distribution type not yet implemented")
 
+    def sample(self, size=None, quantize=True):
+        """Samples from the distribution
+
+        Keyword Arguments:
+            size {int or tuple of ints} -- Output shape. If the given shape is, e.g., (m, n, k), then m * n * k samples are drawn.
+            If size is None (default), a single value is returned if loc and scale are both scalars. Otherwise,
+            np.broadcast(loc, scale).size samples are drawn. (default: {None})
+            quantize {bool} -- Whether to round EXPONENTIAL samples up to whole ticks; False for continuous-time runs. (default: {True})
+
+        Returns:
+            ndarray or scalar -- Drawn samples from the parameterized distribution.
+        """
+
+        if self.distribution_type == DistributionType.CONSTANT and size is None:
+            return self.value
+        if size is not None:
+            samples = self.draw(size)
+            if quantize and self.distribution_type == DistributionType.EXPONENTIAL:
+                return numpy.ceil(samples).astype(int)
+            return samples
+        if self.buffer_index >= len(self.buffer):
+            self.buffer = self.draw(Distribution.BUFFER_SIZE).tolist()
+            self.buffer_index = 0
+        value = self.buffer[self.buffer_index]
+        self.buffer_index += 1
+        if quantize and self.distribution_type == DistributionType.EXPONENTIAL:
+            return int(math.ceil(value))
+        return value
+
+    def __getstate__(self):
+        """Leaves the sample buffer out of copies, so a copied distribution draws from its own (possibly reseeded) random state.
+
+        Returns:
+            dict -- State of the object without the sample buffer.
+        """
+
+        state = dict(self.__dict__)
+        state['buffer'] = []
+        state['buffer_index'] = 0
+        return state
+
     def __str__(self):
         """        
         Returns:
             str -- String representation of object.
         """
 
-        return pformat(self.__dict__, indent=12)
+        return pformat(self.__getstate__(), indent=12)
 
     def __repr__(self):
         """        
@@ -79,4 +126,4 @@ class Distribution:
             str -- String representation of object.
         """
 
-        return pformat(self.__dict__, indent=12)
+        return pformat(self.__getstate__(), indent=12)
@@ -0,0 +1,78 @@
+from array import array
+from itertools import izip
+import numpy
+from transaction import State
+
+
+class EventLog:
+    """Simulation-wide, append-only columnar store of tx events.
+    Each event is one row of (time_stamp, miner_id, tx_index, state code) spread over typed arrays, so recording an event doesn't allocate an object.
+    """
+
+    NO_MINER = -1  # Stored in place of a None miner id (the genesis tx has no originating miner).
+
+    def __init__(self, continuous_time=False):
+        """
+        Keyword Arguments:
+            continuous_time {bool} -- Whether time stamps are floats (continuous-event engine) instead of integer ticks. (default: {False})
+        """
+
+        self.time_stamps = array('d' if continuous_time else 'l')
+        self.miner_ids = array('l')
+        self.tx_indices = array('l')
+        self.states = array('b')
+
+    def record(self, time_stamp, miner_id, tx_index, state):
+        """Appends an event marking a change in state of a miner for a given transaction.
+
+        Arguments:
+            time_stamp {int|float} -- Time that the event happened at.
+            miner_id {int|None} -- Id of miner with new state for this transaction.
+            tx_index {int} -- Registry index (tx.index) of the transaction.
+            state {State} -- New state that the miner entered into for this transaction.
+        """
+
+        self.time_stamps.append(time_stamp)
+        self.miner_ids.append(EventLog.NO_MINER if miner_id is None else miner_id)
+        self.tx_indices.append(tx_index)
+        self.states.append(state.value)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __iter__(self):
+        """
+        Returns:
+            iterator -- (time_stamp, miner_id, tx_index, state code) for each event, in the order they were recorded.
+        """
+
+        return izip(self.time_stamps, self.miner_ids, self.tx_indices, self.states)
+
+    def toArrays(self):
+        """
+        Returns:
+            dict -- Maps column name to a numpy array viewing that column (no copy is made).
+        """
+
+        return {
+            'time_stamps': numpy.frombuffer(self.time_stamps, dtype=self.time_stamps.typecode),
+            'miner_ids': numpy.frombuffer(self.miner_ids, dtype=self.miner_ids.typecode),
+            'tx_indices': numpy.frombuffer(self.tx_indices, dtype=self.tx_indices.typecode),
+            'states': numpy.frombuffer(self.states, dtype=self.states.typecode)
+        }
+
+    def historiesByTx(self, tx_count):
+        """Rebuilds per-tx histories of (time_stamp, miner_id, state name) tuples, for serialization.
+
+        Arguments:
+            tx_count {int} -- Number of registered tx.
+
+        Returns:
+            list(list(tuple)) -- History of each tx, indexed by tx index, in the order the events were recorded.
+        """
+
+        state_names = {state.value: state.name for state in State}
+        histories = [[] for _ in xrange(tx_count)]
+        for time_stamp, miner_id, tx_index, state in self:
+            histories[tx_index].append((time_stamp, None if miner_id == EventLog.NO_MINER else miner_id, state_names[state]))
+        return histories
@@ -0,0 +1,93 @@
+import heapq
+import math
+
+
+def arrivalTime(now, delay, continuous=False):
+    """
+    Arguments:
+        now {int|float} -- Current simulation time.
+        delay {int|float} -- Sampled network delay.
+
+    Keyword Arguments:
+        continuous {bool} -- Whether times are floats (True) or whole ticks (False). (default: {False})
+
+    Returns:
+        int|float -- Time at which a message sent now with the given delay arrives (always a later tick when not continuous).
+    """
+
+    if continuous:
+        return now + max(delay, 0.0)
+    return now + max(1, int(math.floor(delay)))
+
+
+class EventQueue:
+    """Global priority queue of in-flight messages ordered by arrival time (used by the event-driven engines in place of per-miner queues).
+    """
+
+    def __init__(self, continuous=False):
+        """
+        Keyword Arguments:
+            continuous {bool} -- Whether arrival times are floats (True) or whole ticks (False). (default: {False})
+        """
+
+        self.continuous = continuous
+        self.heap = []
+        self.count = 0  # Tie-breaker so that messages arriving at the same time pop in the order they were sent.
+
+    def push(self, recipient, msg, now, delay):
+        """Schedules msg to arrive at recipient delay ticks after now.
+
+        Arguments:
+            recipient {Miner} -- Miner the message is addressed to.
+            msg {Message} -- Message to deliver.
+            now {int|float} -- Current simulation time.
+            delay {int|float} -- Sampled network delay.
+        """
+
+        heapq.heappush(self.heap, (arrivalTime(now, delay, self.continuous), self.count, recipient, msg))
+        self.count += 1
+
+    def nextTime(self):
+        """
+        Returns:
+            int|float|None -- Arrival time of the earliest in-flight message, or None if nothing is in flight.
+        """
+
+        if not self.heap:
+            return None
+        return self.heap[0][0]
+
+    def popDue(self, now):
+        """Pops every message that arrives at or before now.
+
+        Arguments:
+            now {int|float} -- Current simulation time.
+
+        Returns:
+            list(tuple) -- List of (recipient, msg) tuples in arrival order.
+        """
+
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            arrival, count, recipient, msg = heapq.heappop(self.heap)
+            due.append((recipient, msg))
+        return due
+
+    def largestBacklog(self):
+        """
+        Returns:
+            int -- Most messages in flight to any one recipient.
+        """
+
+        counts = {}
+        for arrival, count, recipient, msg in self.heap:
+            counts[recipient] = counts.get(recipient, 0) + 1
+        return max(counts.values()) if counts else 0
+
+    def __len__(self):
+        """
+        Returns:
+            int -- Number of messages in flight.
+        """
+
+        return len(self.heap)
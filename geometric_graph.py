@@ -0,0 +1,105 @@
+import math
+import networkx as nx
+import numpy
+import random
+
+
+def randomGeometricGraph(number_of_nodes, radius):
+    """Generates the same graph as networkx.random_geometric_graph (same use of the random module, same edges in the same order), but buckets the nodes into a grid of radius-sized cells and only compares nodes in neighboring cells.
+    That takes time proportional to the number of edges instead of checking every pair of nodes.
+
+    Arguments:
+        number_of_nodes {int} -- Number of nodes, labeled 0 to number_of_nodes - 1.
+        radius {float} -- Nodes at most this far apart in the unit square are connected.
+
+    Returns:
+        networkx.Graph -- Graph whose nodes have their position in the 'pos' attribute.
+    """
+
+    positions = [[random.random() for i in range(2)] for node in xrange(number_of_nodes)]
+    graph = nx.Graph()
+    graph.add_nodes_from(xrange(number_of_nodes))
+    nx.set_node_attributes(graph, {node: position for node, position in enumerate(positions)}, 'pos')
+    if number_of_nodes < 2:
+        return graph
+
+    points = numpy.array(positions)
+    cells_per_side = max(1, int(math.ceil(1.0 / radius)))
+    cell_coords = numpy.minimum((points / radius).astype(numpy.int64), cells_per_side - 1)
+    cell_ids = cell_coords[:, 0] * cells_per_side + cell_coords[:, 1]
+    order = numpy.argsort(cell_ids, kind='mergesort')
+    sorted_ids = cell_ids[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    cells = dict(zip(sorted_ids[starts].tolist(), numpy.split(order, starts[1:])))  # Maps cell id to the nodes in it.
+
+    squared_radius = radius ** 2
+    sources = []
+    targets = []
+    for cell_id, members in cells.items():
+        x, y = divmod(cell_id, cells_per_side)
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):  # Half of the neighborhood, so that each pair of cells is compared once.
+            other_x, other_y = x + dx, y + dy
+            if other_x >= cells_per_side or not 0 <= other_y < cells_per_side:
+                continue
+            others = members if (dx, dy) == (0, 0) else cells.get(other_x * cells_per_side + other_y)
+            if others is None:
+                continue
+            diff = points[members][:, None, :] - points[others][None, :, :]
+            close = (diff[:, :, 0] * diff[:, :, 0] + diff[:, :, 1] * diff[:, :, 1]) <= squared_radius
+            if (dx, dy) == (0, 0):
+                close = numpy.triu(close, 1)
+            rows, columns = numpy.nonzero(close)
+            sources.append(members[rows])
+            targets.append(others[columns])
+
+    if sources:
+        sources = numpy.concatenate(sources)
+        targets = numpy.concatenate(targets)
+        low = numpy.minimum(sources, targets)
+        high = numpy.maximum(sources, targets)
+        edge_order = numpy.lexsort((high, low))  # The order networkx adds them in (itertools.combinations of the nodes).
+        graph.add_edges_from(zip(low[edge_order].tolist(), high[edge_order].tolist()))
+    return graph
+
+
+def largestComponent(graph):
+    """
+    Arguments:
+        graph {networkx.Graph} -- Graph to take the component from.
+
+    Returns:
+        networkx.Graph -- Copy of graph's largest connected component, with nodes relabeled 0 to size - 1 (in their original order).
+    """
+
+    nodes = sorted(max(nx.connected_components(graph), key=len))
+    labels = {node: label for label, node in enumerate(nodes)}
+    component = nx.Graph()
+    component.add_nodes_from((labels[node], graph.nodes[node]) for node in nodes)
+    component.add_edges_from((labels[u], labels[v], data) for u, v, data in graph.edges(nodes, data=True))  # Builds the copy directly; graph.subgraph(...).copy() is several times slower on large graphs.
+    return component
+
+
+def bridgeComponents(graph):
+    """Connects a geometric graph by adding one edge per extra component, largest components first: each joins the nodes connected so far through its geometrically closest pair of nodes.
+
+    Arguments:
+        graph {networkx.Graph} -- Graph with nodes labeled 0 to n - 1 and their position in the 'pos' attribute; modified in place.
+
+    Returns:
+        int -- Number of edges added.
+    """
+
+    components = sorted((sorted(component) for component in nx.connected_components(graph)), key=lambda component: (-len(component), component[0]))
+    connected = numpy.array(components[0])
+    points = numpy.array([graph.nodes[node]['pos'] for node in graph.nodes])
+    for component in components[1:]:
+        component = numpy.array(component)
+        best = None
+        for node in component:  # Components other than the largest one are usually small, so this stays cheap.
+            distances = ((points[connected] - points[node]) ** 2).sum(axis=1)
+            closest = int(numpy.argmin(distances))
+            if best is None or distances[closest] < best[0]:
+                best = (distances[closest], int(node), int(connected[closest]))
+        graph.add_edge(best[1], best[2])
+        connected = numpy.concatenate((connected, component))
+    return len(components) - 1
@@ -43,19 +43,15 @@ class IdBag:
         self.bag = []
 
 
-singletons = {}
-
-
 def getSingleBag(simulation):
     """
     Arguments:
         simulation {Simulation} -- Simulation that the bag will be used in.
 
     Returns:
-        IdBag -- A singleton IdBag object.
+        IdBag -- The IdBag object shared by all miners of the simulation (kept on the simulation so that concurrent runs never share one).
     """
 
-    global singletons
-    if simulation.thread_id not in singletons:
-        singletons[simulation.thread_id] = IdBag(simulation)
-    return singletons[simulation.thread_id]
+    if simulation.single_id_bag is None:
+        simulation.single_id_bag = IdBag(simulation)
+    return simulation.single_id_bag
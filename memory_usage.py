@@ -0,0 +1,90 @@
+from enum import Enum
+import os
+import sys
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+import dag
+import miner
+import transaction
+
+
+def objectSize(obj, shared_types=()):
+    """Approximates the memory used by an object and everything only it references, following instance attributes (__dict__ or __slots__) and containers.
+
+    Arguments:
+        obj {any} -- Object to measure.
+
+    Keyword Arguments:
+        shared_types {tuple(type)} -- Instances of these types (other than obj itself) belong to someone else, so they are neither counted nor followed. (default: {()})
+
+    Returns:
+        int -- Size in bytes.
+    """
+
+    size = 0
+    seen = set()
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if current is not obj and isinstance(current, shared_types):
+            continue
+        if current is None or isinstance(current, (type, Enum)) or (type(current) is int and -5 <= current <= 256):  # Singletons, classes and cached small ints are shared by everyone.
+            continue
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            if hasattr(current, '__dict__'):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+def residentMemory():
+    """
+    Returns:
+        int|None -- Bytes of memory the process has resident; its peak so far where the current amount can't be read (no /proc), or None if neither can.
+    """
+
+    try:
+        with open('/proc/self/statm', 'r') as infile:
+            return int(infile.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, kilobytes elsewhere.
+
+
+def measureSimulation(simulation):
+    """Measures the per-object cost of the simulation's hottest objects.
+
+    Arguments:
+        simulation {Simulation} -- Completed simulation.
+
+    Returns:
+        dict -- Average bytes per tx (tx_bytes, plus dag_node_bytes for its node in the shared DAG) and bytes per in-flight message of each type (block_msg_bytes, request_msg_bytes), with tx_count.
+    """
+
+    shared_types = (transaction.Tx, dag.Node, miner.Miner)
+    tx_count = len(simulation.all_tx)
+    some_tx = simulation.all_tx[-1]
+    return {
+        'tx_count': tx_count,
+        'tx_bytes': float(sum(objectSize(tx, shared_types) for tx in simulation.all_tx)) / tx_count,
+        'dag_node_bytes': float(sum(objectSize(node, shared_types) for node in simulation.dag)) / tx_count,
+        'block_msg_bytes': objectSize(miner.Message(0, miner.Type.BLOCK, some_tx), shared_types),  # The tx itself is shared by every message carrying it.
+        'request_msg_bytes': objectSize(miner.Message(0, miner.Type.REQUEST, some_tx.index), shared_types)
+    }
@@ -1,18 +1,22 @@
 from enum import Enum
+from event_queue import arrivalTime
+from bitset import Bitset
 import logging
 import transaction
 
 
-class Message:
+class Message(object):
     """Message from one miner to another.
     """
 
+    __slots__ = ('sender', 'type', 'content')
+
     def __init__(self, sender_id, msg_type, content):
         """
         Arguments:
             sender_id {int} -- Id of sending miner.
             msg_type {Type} -- Type of message.
-            content {Tx|str} -- Tx if type is BLOCK, hash string if type is REQUEST.
+            content {Tx|int} -- Tx if type is BLOCK, tx index if type is REQUEST.
         """
 
         self.sender = sender_id
@@ -30,6 +34,7 @@ class Type(Enum):
 
 class Miner:
     """Miner superclass (also implements naive miner).
+    A seeded run must give the same results in any process, so whatever a miner draws random numbers over or queues must not come in set order, which depends on memory addresses.
     """
 
     name = "Naive"
@@ -39,7 +44,7 @@ class Miner:
         Arguments:
             miner_id {int} -- Miner's id.
             genesis_tx {Tx} -- Blockchain protocol's genesis transaction.
-            graph {networkx.Graph} -- Graph of network being simulated.
+            graph {networkx.Graph|Network} -- Graph of network being simulated.
             simulation {Simulation} -- Simulation object that stores settings and simulation variables.
             power {int} -- Miner's power relative to other miners.
         """
@@ -47,17 +52,20 @@ class Miner:
         self.power = power
         self.graph = graph
         self.simulation = simulation
-        self.pre_queue = []
-        self.queue = []
-        self.seen_tx = {}  # Dictionary mapping hash to tx for seen tx.
-        self.seen_tx[genesis_tx.hash] = genesis_tx
+        self.queue = {}  # Maps arrival tick to list of messages arriving on that tick.
+        self.early_tick = -1  # Tick that self.early is for.
+        self.early = {}  # Maps arrival tick to number of messages pushed this tick before the miner's turn (see pushMsg).
+        self.seen_tx = Bitset()  # Registry indices (tx.index) of seen tx.
+        self.seen_tx.add(genesis_tx.index)
         self.changed_last_step = False
+        self.reissue_ids = set()  # Ids that need to be reissued (subclasses populate this in checkAllTx).
         self.id_bag = simulation.protocol.getIdBag(simulation)
-        self.adjacencies = {}  # These will be filled in by simulation.finalizeMiners().
+        self.adjacencies = {}  # Maps neighbor id to (Miner, Distribution) of the edge to it; filled in by simulation.attachMiners() (with a network.Adjacencies on a Network).
 
     def pushMsg(self, msg, delay=0):
-        """Push message into prequeue. Will be added to queue when flushMsgs() is called.
-        This is done to prevent miners that execute later in a step from acting on msgs from miners that executed earlier that step.
+        """Schedule message to be received delay ticks from now (never the current tick).
+        Messages are kept in a calendar keyed by arrival tick, so they don't have to be touched again until they arrive.
+        Messages arriving on the same tick are received in the order the old per-tick queue delivered them in: that queue put a miner's older messages back on its turn, behind anything sent to it earlier in the pass, so a message pushed before the miner's turn goes ahead of the ones pushed on earlier ticks.
 
         Arguments:
             msg {Message} -- Message to push onto queue.
@@ -65,33 +73,48 @@ class Miner:
         Keyword Arguments:
             delay {int} -- Delay in ticks until message arrives. (default: {0})
         """
-        self.pre_queue.append([msg, delay])
-
-    def flushMsgs(self):
-        """Adds all messages from prequeue to queue.
+        self.simulation.msgs_in_flight += 1
+        if self.simulation.profile is not None:
+            self.simulation.profile.msgs_sent += 1
+        if self.simulation.event_queue is not None:  # Event-driven engines keep one global queue instead.
+            self.simulation.event_queue.push(self, msg, self.simulation.tick, delay)
+            return
+        arrival = arrivalTime(self.simulation.tick, delay)
+        msgs = self.queue.get(arrival)
+        if msgs is None:
+            msgs = self.queue[arrival] = []
+            self.simulation.scheduleMiner(self, arrival)
+        handling = self.simulation.handling
+        if handling is not None and handling.id < self.id:  # Before this miner's turn in the pass.
+            if self.early_tick != self.simulation.tick:
+                self.early_tick = self.simulation.tick
+                self.early = {}
+            position = self.early.get(arrival, 0)
+            self.early[arrival] = position + 1
+            msgs.insert(position, msg)
+        else:
+            msgs.append(msg)
+
+    def queuedMsgs(self):
+        """
+        Returns:
+            int -- Number of messages in the miner's queue (always 0 with the event-driven engines, which keep one global queue).
         """
 
-        self.queue = self.pre_queue[:]
-        self.pre_queue = []
+        return sum(len(msgs) for msgs in self.queue.values())
 
     def popMsg(self):
-        """Pops all messages with delay 0 from queue, decrements delay of all other messages in queue.
+        """Pops all messages arriving this tick from queue.
 
         Returns:
             list(Message) -- List of all messages recieved this tick.
         """
 
-        if not self.queue:
-            return []
-        returned_msgs = []
-        for msg, delay in self.queue:
-            delay -= 1
-            if delay < 1:
-                returned_msgs.append(msg)
-            else:
-                self.pushMsg(msg, delay)
-        self.queue = []
-        return returned_msgs
+        msgs = self.queue.pop(self.simulation.tick, [])
+        self.simulation.msgs_in_flight -= len(msgs)
+        if self.simulation.profile is not None:
+            self.simulation.profile.msgs_delivered += len(msgs)
+        return msgs
 
     def broadcast(self, tx):
         """Broadcast tx to all adjacent miners.
@@ -100,8 +123,8 @@ class Miner:
             tx {Tx} -- Transaction to broadcast.
         """
 
-        for neighbor_id in self.adjacencies:
-            self.sendMsg(neighbor_id, Message(self.id, Type.BLOCK, tx))
+        for neighbor, delay in self.adjacencies.itervalues():  # Same order as iterating over the neighbor ids, without looking each one up again.
+            self.sendOverEdge(neighbor, delay, Message(self.id, Type.BLOCK, tx))
 
     def sendMsg(self, recipient_id, msg):
         """Send message to a recipient miner.
@@ -111,20 +134,31 @@ class Miner:
             msg {Message} -- Message to send.
         """
 
-        assert not (msg.type == Type.BLOCK and set(msg.content.pointers) - set(self.seen_tx))  # Shouldn't send a tx if I don't know tx for all of its pointers.
         neighbor, delay = self.adjacencies[recipient_id]
-        neighbor.pushMsg(msg, delay.sample())
+        self.sendOverEdge(neighbor, delay, msg)
+
+    def sendOverEdge(self, neighbor, delay, msg):
+        """Send message to an adjacent miner.
+
+        Arguments:
+            neighbor {Miner} -- Recipient miner.
+            delay {Distribution} -- Network delay of the edge to the recipient.
+            msg {Message} -- Message to send.
+        """
 
-    def sendRequest(self, recipient_id, target_hash):
-        """Send request for a tx with target_hash.
+        assert not (msg.type == Type.BLOCK and not all(pointer in self.seen_tx for pointer in msg.content.pointers))  # Shouldn't send a tx if I don't know tx for all of its pointers.
+        neighbor.pushMsg(msg, delay.sample(quantize=not self.simulation.continuous_time))
+
+    def sendRequest(self, recipient_id, target_index):
+        """Send request for a tx with target_index.
         Provided so subclasses don't have to know about Message/Type classes.
 
         Arguments:
             recipient_id {int} -- Recipient miner's id.
-            target_hash {str} -- Hash of transaction being requested.
+            target_index {int} -- Index of transaction being requested.
         """
 
-        self.sendMsg(recipient_id, Message(self.id, Type.REQUEST, target_hash))
+        self.sendMsg(recipient_id, Message(self.id, Type.REQUEST, target_index))
 
     def handleNewTx(self, tx, sender_id):
         """Process new tx by adding it to miner's view of blockain and broadcasting tx if appropriate.
@@ -134,7 +168,7 @@ class Miner:
             sender_id {int} -- Id of miner who we received this tx from.
         """
 
-        self.seen_tx[tx.hash] = tx
+        self.seen_tx.add(tx.index)
         for x in self.processNewTx(tx, sender_id):  # ABSTRACT - Process tx.
             self.broadcast(x)  # Broadcast new or first-time-seen-NON-ORPHAN tx only.
 
@@ -144,24 +178,25 @@ class Miner:
 
         force_sheep_check = self.changed_last_step
         self.changed_last_step = False
-        if not self.queue:
-            return
 
         need_to_check = False
         for msg in self.popMsg():  # Receive message(s) from queue.
             if msg.type == Type.BLOCK:
                 new_tx = msg.content
-                if new_tx.hash in self.seen_tx:
+                if new_tx.index in self.seen_tx:
+                    if self.simulation.profile is not None:
+                        self.simulation.profile.duplicate_msgs += 1
                     continue
                 need_to_check = True
                 self.changed_last_step = True
                 self.handleNewTx(new_tx, msg.sender)
             elif msg.type == Type.REQUEST:  # Requests are issued by other miners.
-                target_hash = msg.content
-                assert target_hash in self.seen_tx  # I should never get a request for a tx I haven't seen.
-                requestedTx = self.seen_tx[target_hash]
+                requestedTx = self.simulation.all_tx[msg.content]
+                assert requestedTx.index in self.seen_tx  # I should never get a request for a tx I haven't seen.
                 self.sendMsg(msg.sender, Message(self.id, Type.BLOCK, requestedTx))
         if need_to_check or (self.hasSheep() and force_sheep_check):  # Have to check every time if has sheep.
+            if self.simulation.profile is not None:
+                self.simulation.profile.check_all_calls += 1
             self.checkAllTx()
 
     def makeNewTx(self):
@@ -171,6 +206,8 @@ class Miner:
         logging.info("New tx (%d) created by miner %d" % (new_tx.id, self.id))
         self.changed_last_step = True
         self.handleNewTx(new_tx, self.id)
+        if self.simulation.profile is not None:
+            self.simulation.profile.check_all_calls += 1
         self.checkAllTx()
 
     # ==ABSTRACT====================================
@@ -183,7 +220,7 @@ class Miner:
             Tx -- Newly created transaction.
         """
         new_tx = transaction.Tx(self.simulation.tick, self.id, self.id_bag.getNextId(), [])
-        self.simulation.all_tx.append(new_tx)
+        self.simulation.registerTx(new_tx)
         return new_tx
 
     def checkReissues(self):
@@ -208,7 +245,7 @@ class Miner:
         Returns:
             list(Tx) -- List of transactions to broadcast to neighbors.
         """
-        new_tx.addEvent(self.simulation.tick, self.id, transaction.State.CONSENSUS)
+        self.simulation.event_log.record(self.simulation.tick, self.id, new_tx.index, transaction.State.CONSENSUS)
         return [new_tx]
 
     def checkAllTx(self):
@@ -216,6 +253,13 @@ class Miner:
         """
         return None
 
+    def countOrphans(self):
+        """
+        Returns:
+            int -- Number of tx the miner has received but can't connect to its chain yet.
+        """
+        return 0
+
     def removeSheep(self, sheep_id):
         """Overseer will call this to tell the miner that it doesn't have to shepherd an id anymore.
 
@@ -0,0 +1,202 @@
+import networkx as nx
+import numpy
+
+
+class Network:
+    """Miner graph stored as compressed sparse row (CSR) numpy arrays, for networks too large to keep as a networkx.Graph plus a dict of neighbors per miner.
+    Node positions are indexes into nodes; row p of the CSR arrays holds the neighbors of the node at position p (sorted by position) and the delay of each of those edges.
+    Nothing about a network changes once it is built, so runs can share it.
+    """
+
+    def __init__(self, nodes, edges, delays, delay_ids=None):
+        """
+        Arguments:
+            nodes {ndarray} -- Node labels (ints), in the order miners are created in.
+            edges {ndarray} -- (edges x 2) array of the labels of each undirected edge's ends.
+            delays {list(Distribution)} -- Network delay distributions used by the edges.
+
+        Keyword Arguments:
+            delay_ids {ndarray} -- Index into delays of each edge's delay; None if every edge uses delays[0]. (default: {None})
+        """
+
+        self.nodes = numpy.asarray(nodes, dtype=numpy.int64)
+        self.delays = delays
+        edges = numpy.asarray(edges, dtype=numpy.int64).reshape(-1, 2)
+        if delay_ids is None:
+            delay_ids = numpy.zeros(len(edges), dtype=numpy.int64)
+        sources = self.positionsOf(edges[:, 0])
+        targets = self.positionsOf(edges[:, 1])
+        not_loop = sources != targets  # A self-loop is only listed once in its node's row, like in networkx's adjacency.
+        rows = numpy.concatenate((sources, targets[not_loop]))
+        columns = numpy.concatenate((targets, sources[not_loop]))
+        order = numpy.lexsort((columns, rows))
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(rows, minlength=len(self.nodes))))).astype(numpy.int64)  # Row p is offsets[p] to offsets[p + 1].
+        self.neighbors = columns[order].astype(numpy.int32)
+        self.delay_ids = numpy.concatenate((delay_ids, delay_ids[not_loop]))[order].astype(numpy.min_scalar_type(max(len(delays) - 1, 0)))
+
+    def positionsOf(self, labels):
+        """
+        Arguments:
+            labels {ndarray} -- Node labels.
+
+        Returns:
+            ndarray -- Position of each of the nodes.
+        """
+
+        if len(self.nodes) and self.nodes[0] == 0 and numpy.array_equal(self.nodes, numpy.arange(len(self.nodes))):  # Generated graphs are labeled by position.
+            return labels
+        sorter = numpy.argsort(self.nodes, kind='mergesort')
+        found = numpy.searchsorted(self.nodes, labels, sorter=sorter)
+        positions = sorter[numpy.minimum(found, len(self.nodes) - 1)]
+        if not numpy.array_equal(self.nodes[positions], labels):
+            raise Exception("Network has edges between nodes that aren't in it.")
+        return positions
+
+    def numberOfEdges(self):
+        """
+        Returns:
+            int -- Number of undirected edges.
+        """
+
+        return (len(self.neighbors) + numpy.count_nonzero(self.neighbors == self.rowPositions())) // 2
+
+    def rowPositions(self):
+        """
+        Returns:
+            ndarray -- Position of the node that each entry of neighbors belongs to.
+        """
+
+        return numpy.repeat(numpy.arange(len(self.nodes), dtype=numpy.int32), numpy.diff(self.offsets))
+
+    def edges(self):
+        """
+        Returns:
+            ndarray -- (edges x 2) array of the labels of each undirected edge's ends, ordered by position.
+        """
+
+        rows = self.rowPositions()
+        once = rows <= self.neighbors
+        return numpy.column_stack((self.nodes[rows[once]], self.nodes[self.neighbors[once]]))
+
+    def toGraph(self):
+        """
+        Returns:
+            networkx.Graph -- The network's nodes and edges (without network delays), e.g. for exporting it.
+        """
+
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes.tolist())
+        edges = self.edges()
+        graph.add_edges_from(zip(edges[:, 0].tolist(), edges[:, 1].tolist()))
+        return graph
+
+
+def fromGraph(graph):
+    """
+    Arguments:
+        graph {networkx.Graph} -- Graph whose edges have their delay in the 'network_delay' attribute.
+
+    Returns:
+        Network -- The graph as CSR arrays.
+    """
+
+    delays = []
+    delay_ids = {}  # Maps id of a delay distribution to its index in delays (usually all edges share one).
+    edges = []
+    edge_delay_ids = []
+    for u, v, delay in graph.edges(data='network_delay'):
+        if delay is None:
+            raise Exception("Edge (%s, %s) has no network delay." % (u, v))
+        if id(delay) not in delay_ids:
+            delay_ids[id(delay)] = len(delays)
+            delays.append(delay)
+        edges.append((u, v))
+        edge_delay_ids.append(delay_ids[id(delay)])
+    return Network(list(graph.nodes), edges, delays, numpy.array(edge_delay_ids, dtype=numpy.int64))
+
+
+class Adjacencies(object):
+    """One miner's neighbors in a run on a Network; stands in for the dict mapping neighbor id to (Miner, Distribution) that miners get on a networkx.Graph.
+    Only holds references to arrays and lists shared by the whole run, so it costs the same no matter how many neighbors the miner has.
+    """
+
+    __slots__ = ('network', 'position', 'miners', 'delays')
+
+    def __init__(self, network, position, miners, delays):
+        """
+        Arguments:
+            network {Network} -- Network of the run.
+            position {int} -- Position of the miner in network.
+            miners {list(Miner)} -- The run's miners, by position.
+            delays {list(Distribution)} -- The run's copies of network.delays.
+        """
+
+        self.network = network
+        self.position = position
+        self.miners = miners
+        self.delays = delays
+
+    def __len__(self):
+        """
+        Returns:
+            int -- Number of neighbors.
+        """
+
+        return int(self.network.offsets[self.position + 1] - self.network.offsets[self.position])
+
+    def __iter__(self):
+        """
+        Returns:
+            iterator(int) -- Ids of the neighbors.
+        """
+
+        return (neighbor.id for neighbor, delay in self.itervalues())
+
+    def __contains__(self, neighbor_id):
+        """
+        Arguments:
+            neighbor_id {int} -- Id of a miner.
+
+        Returns:
+            bool -- True if the miner is a neighbor, False otherwise.
+        """
+
+        return self.find(neighbor_id) >= 0
+
+    def __getitem__(self, neighbor_id):
+        """
+        Arguments:
+            neighbor_id {int} -- Id of a neighbor.
+
+        Returns:
+            tuple(Miner, Distribution) -- The neighbor and the delay of the edge to it.
+        """
+
+        index = self.find(neighbor_id)
+        if index < 0:
+            raise KeyError(neighbor_id)
+        return self.miners[self.network.neighbors[index]], self.delays[self.network.delay_ids[index]]
+
+    def find(self, neighbor_id):
+        """
+        Arguments:
+            neighbor_id {int} -- Id of a neighbor.
+
+        Returns:
+            int -- Index of the edge to the neighbor in the network's arrays, or -1 if it isn't a neighbor.
+        """
+
+        start, end = self.network.offsets[self.position:self.position + 2].tolist()
+        matches = numpy.flatnonzero(self.network.nodes[self.network.neighbors[start:end]] == neighbor_id)
+        return start + int(matches[0]) if len(matches) else -1
+
+    def itervalues(self):
+        """
+        Returns:
+            iterator(tuple(Miner, Distribution)) -- Each neighbor with the delay of the edge to it, in position order.
+        """
+
+        start, end = self.network.offsets[self.position:self.position + 2].tolist()
+        miners = self.miners
+        delays = self.delays
+        return ((miners[neighbor], delays[delay_id]) for neighbor, delay_id in zip(self.network.neighbors[start:end].tolist(), self.network.delay_ids[start:end].tolist()))
@@ -13,7 +13,7 @@ def nodeLabel(node):
     """
 
     tx = node.tx
-    return '<<B>%d</B><BR/>%s>' % (tx.id, tx.hash[:4])
+    return '<<B>%d</B><BR/>%d>' % (tx.id, tx.index)
 
 
 visited = set()
@@ -33,7 +33,7 @@ def dagToDig(miner, node, digraph=None):
     """
 
     global visited
-    node_id = "%s%d" % (node.tx.hash, miner.id)
+    node_id = "%d_%d" % (node.tx.index, miner.id)
     if node in visited:
         return digraph
     if digraph is None:
@@ -45,7 +45,9 @@ def dagToDig(miner, node, digraph=None):
         digraph.node(node_id, label=nodeLabel(node))
     visited.add(node)
     for child in node.children:
-        child_id = "%s%d" % (child.tx.hash, miner.id)
+        if child.tx.index not in miner.chain_pointers:  # Nodes are shared by all miners; only plot the ones in this miner's view.
+            continue
+        child_id = "%d_%d" % (child.tx.index, miner.id)
         digraph.edge(child_id, node_id)
         dagToDig(miner, child, digraph)
     return digraph
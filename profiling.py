@@ -0,0 +1,80 @@
+from enum import Enum
+import json
+import timeit
+
+
+class Phase(Enum):
+    """Enumeration of the parts of a simulation's main loop that a Profile times.
+    """
+
+    DELIVER = 0  # Picking the miners with messages arriving (and, in the event-driven engines, handing the messages over).
+    HANDLE_MSGS = 1  # Miner.handleMsgs, including the checkAllTx calls it makes.
+    CHECK_REISSUES = 2  # Miner.checkReissues.
+    GENERATE = 3  # Rolling for and making new tx.
+    TERMINATION = 4  # SimulationSettings.shouldTerminate.
+    SCHEDULE = 5  # Finding the time of the next event (event-driven engines only).
+
+
+class Profile:
+    """Per-phase wall time and event counters of one run, collected when the settings enable profiling.
+    The main loop calls lap() at the end of each phase, so a phase is charged the time since the previous lap.
+    """
+
+    def __init__(self):
+        self.setup_seconds = 0.0  # Creating the miners (Simulation.attachMiners).
+        self.run_seconds = 0.0  # All of Simulation.runSimulation.
+        self.phase_seconds = [0.0] * len(Phase)  # Indexed by Phase value.
+        self.steps = 0  # Ticks (TICK engine) or event times (event-driven engines) the main loop went through.
+        self.msgs_sent = 0
+        self.msgs_delivered = 0
+        self.duplicate_msgs = 0  # Delivered blocks whose tx the recipient had already seen, which it drops.
+        self.check_all_calls = 0  # Calls to Miner.checkAllTx.
+        self.nodes_visited = 0  # Nodes checkAllTx looked at (for Bitcoin, the ones whose consensus or sheep state can have changed).
+        self.orphan_rescans = 0  # Times an orphan was looked at again because one of its missing parents was connected.
+        self.last_lap = None
+
+    def start(self):
+        """Starts timing the first phase.
+        """
+
+        self.last_lap = timeit.default_timer()
+
+    def lap(self, phase):
+        """Charges the time since the previous lap to a phase.
+
+        Arguments:
+            phase {Phase} -- Phase that just ended.
+        """
+
+        now = timeit.default_timer()
+        self.phase_seconds[phase.value] += now - self.last_lap
+        self.last_lap = now
+
+    def toDict(self):
+        """
+        Returns:
+            dict -- The profile, ready to serialize to JSON.
+        """
+
+        return {
+            'setup_seconds': self.setup_seconds,
+            'run_seconds': self.run_seconds,
+            'phase_seconds': {phase.name: self.phase_seconds[phase.value] for phase in Phase},
+            'steps': self.steps,
+            'msgs_sent': self.msgs_sent,
+            'msgs_delivered': self.msgs_delivered,
+            'duplicate_msgs': self.duplicate_msgs,
+            'check_all_calls': self.check_all_calls,
+            'nodes_visited': self.nodes_visited,
+            'orphan_rescans': self.orphan_rescans
+        }
+
+    def write(self, fname):
+        """Writes the profile to a JSON file.
+
+        Arguments:
+            fname {str} -- File name to write to.
+        """
+
+        with open(fname, 'w') as outfile:
+            json.dump(self.toDict(), outfile, indent=1, sort_keys=True)
@@ -33,9 +33,13 @@ class ProtocolSettings:
             data = value
 
         self.protocol_type = ProtocolType[data['type']]
+        self.prune_depth_multiple = None  # Bitcoin only; None keeps every block for the whole run.
         if self.protocol_type == ProtocolType.BITCOIN:
             self.accept_depth = data['acceptDepth']
             self.target_ticks_between_generation = data['targetTicksBetweenGeneration']
+            # Blocks buried more than this many accept depths below the deepest block get pruned from miners' views (see Bitcoin.pruneChain).
+            if 'pruneDepthMultiple' in data:
+                self.prune_depth_multiple = data['pruneDepthMultiple']
         elif self.protocol_type == ProtocolType.IOTA:
             self.target_ticks_between_generation = data['targetTicksBetweenGeneration']
         else:
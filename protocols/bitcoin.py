@@ -1,24 +1,10 @@
+from bitset import Bitset
+import heapq
 import random
 import transaction
 import miner
 
 
-class Node:
-    """Node in the Bitcoin miner's personal view of the blockchain. Provides forward pointers through blockchain for convenience.
-    """
-
-    def __init__(self, tx):
-        """
-        Arguments:
-            tx {Tx} -- The transaction that the node represents.
-        """
-
-        self.tx = tx
-        self.children = []
-        self.depth = 0  # Used by Bitcoin, not Iota.
-        self.reachable = set()  # Used by Iota, not Bitcoin.
-
-
 class Bitcoin(miner.Miner):
     """Bitcoin protocol miner.
     """
@@ -30,41 +16,65 @@ class Bitcoin(miner.Miner):
         Arguments:
             miner_id {int} -- Miner's id.
             genesis_tx {Tx} -- Blockchain protocol's genesis transaction.
-            graph {networkx.Graph} -- Graph of network being simulated.
+            graph {networkx.Graph|Network} -- Graph of network being simulated.
             simulation {Simulation} -- Simulation object that stores settings and simulation variables.
             power {int} -- Miner's power relative to other miners.
         """
 
         miner.Miner.__init__(self, miner_id, genesis_tx, graph, simulation, power)
-        self.root = Node(genesis_tx)
-        self.chain_pointers = {}  # Maps hash to node whose tx has that hash.
-        self.chain_pointers[genesis_tx.hash] = self.root
+        self.root = simulation.dag[genesis_tx.index]  # Nodes are shared by all miners (see dag.Node); the structures below are this miner's view of them.
+        self.chain_pointers = {}  # Maps tx index to node of that tx.
+        self.chain_pointers[genesis_tx.index] = self.root
+        self.connection_order = {self.root: 0}  # Maps node in chain to when it was connected, which orders the children of a node in this miner's view.
+        self.next_connection = 1
         self.frontier_nodes = set([self.root])  # Update this as nodes are added instead of recomputing deepest nodes.
-        self.consensed_tx = set()  # Set of tx I've accepted (only used to avoid spamming tx.history events); don't count on this for reporting, use tx.history instead.
-        self.root.tx.addEvent(-1, self.id, transaction.State.CONSENSUS)
+        self.consensed_tx = set()  # Set of tx I've accepted (only used to avoid spamming event log events); don't count on this for reporting, use simulation.event_log instead.
+        simulation.event_log.record(-1, self.id, self.root.tx.index, transaction.State.CONSENSUS)
         self.consensed_tx.add(self.root.tx)
         self.sheep_tx = set()  # Queue of tx to shepherd.
         self.reissue_ids = set()  # Temporary set of ids that need to be reissued (populated anew each time checkAll is called).
-        self.orphan_nodes = []
+        self.orphan_nodes = {}  # Maps orphan node to [order, number of distinct parents still missing]; lower order is newer.
+        self.waiting_orphans = {}  # Maps index of a missing parent to list of orphans waiting on it.
+        self.orphan_indices = set()  # Indexes of the tx of orphan_nodes.
+        self.next_orphan_order = 0
+
+        # Fork-choice index, kept up to date incrementally instead of walking the whole chain on every check.
+        self.max_depth = 0  # Depth of the deepest node in the chain.
+        self.deepest_nodes = set([self.root])  # All nodes at max_depth (more than one while there is a tie); also the tips makeTx chooses from.
+        self.main_nodes = {self.root: 0}  # Maps every node with a deepest node below it (as of the last check) to how many of its children are also main nodes.
+        self.main_nodes_by_depth = {0: set([self.root])}
+        self.main_tips = set([self.root])  # deepest_nodes as of the last check.
+        self.confirmed_depth = 0  # Main nodes at or above this depth are the ones in consensed_tx.
+        self.stray_sheep = set()  # Nodes of sheep_tx that are not main nodes (the only ones that can need reissuing).
+        self.id_nodes = {0: [self.root]}  # Maps tx id to all nodes in chain with that id (reissued tx share ids).
+
+        # Finality pruning: main-chain blocks prune_distance above the deepest node become the new root, everything not below it is dropped from this miner's view.
+        # Pruned blocks are still in seen_tx (and in the shared DAG), so they can be put back if a tx that builds on them shows up after all.
+        self.prune_distance = None  # None disables pruning.
+        protocol = simulation.protocol
+        if protocol.prune_depth_multiple is not None:
+            self.prune_distance = max(int(protocol.prune_depth_multiple * protocol.accept_depth), protocol.accept_depth + 1)
+        self.final_ids = Bitset()  # Ids of pruned main-chain nodes; like any consensed ancestor, they cancel reissues of sheep with the same id.
+        self.pruned_sheep = Bitset()  # Indexes of pruned sheep_tx, which are shepherded again if they are put back.
 
         self.file_num = 0
 
-    def findInChain(self, target_hash):
+    def findInChain(self, target_index):
         """
         Arguments:
-            target_hash {str} -- Hash of the tx we're looking for.
+            target_index {int} -- Index of the tx we're looking for.
 
         Returns:
-            {Node|None} -- Returns the node from chain whose tx has the target hash, or None if no such tx is in chain.
+            {Node|None} -- Returns the node from chain whose tx has the target index, or None if no such tx is in chain.
         """
 
-        if target_hash in self.chain_pointers:
-            return self.chain_pointers[target_hash]
+        if target_index in self.chain_pointers:
+            return self.chain_pointers[target_index]
         return None
 
     def addToChain(self, tx_to_add, sender_id):
         """Adds tx_to_add to the chain if all of its parents are in the chain, otherwise it becomes an orphan.
-        Loops through all orphans and tries to connect them, leaving unconnectable nodes as orphans.
+        Connecting a node wakes up only the orphans that were waiting on it, leaving unconnectable nodes as orphans.
 
         Arguments:
             tx_to_add {Tx} -- Tx to be added to the chain.
@@ -74,91 +84,161 @@ class Bitcoin(miner.Miner):
             list(Tx) -- List of tx that were just added to the chain to broadcast to neighbors.
         """
 
-        new_node = Node(tx_to_add)
-        nodes_to_add = [new_node] + self.orphan_nodes[:]
-        self.orphan_nodes = []
-        first = True
+        new_node = self.simulation.dag[tx_to_add.index]
+        missing = []
+        for pointer in tx_to_add.pointers:  # Works for both bitcoin and iota.
+            if pointer not in self.chain_pointers and pointer not in missing:
+                missing.append(pointer)
+        if missing and self.prune_distance is not None:
+            for pointer in missing:
+                if self.isPruned(pointer):
+                    self.restorePruned(self.simulation.dag[pointer], new_node)
+            missing = [pointer for pointer in missing if pointer not in self.chain_pointers]
+        if missing:
+            assert sender_id != self.id  # I'm processing a node I just created but I should never have created an orphan.
+            for pointer in tx_to_add.pointers:
+                if pointer not in self.chain_pointers:
+                    self.sendRequest(sender_id, pointer)
+            self.next_orphan_order -= 1  # Newest orphans are retried first.
+            self.orphan_nodes[new_node] = [self.next_orphan_order, len(missing)]
+            self.orphan_indices.add(tx_to_add.index)
+            for pointer in missing:
+                self.waiting_orphans.setdefault(pointer, []).append(new_node)
+            return []
+
+        # Orphans connect in the order repeatedly scanning [new_node] + orphans (newest first) until nothing changes would connect them:
+        # an orphan woken by a node earlier in the scan connects in the same pass, one woken by a node later in the scan waits for the next pass.
         to_broadcast = []
-        while nodes_to_add:  # Keep checking all nodes until nothing changed (or there are no orphans).
-            chain_changed = False
-            index = 0  # Need to use index because we will be removing items as we iterate through nodes_to_add.
-            while index < len(nodes_to_add):
-                node_to_add = nodes_to_add[index]
-                tx_to_add = node_to_add.tx
-                parents = [(self.findInChain(parent), parent) for parent in tx_to_add.pointers]  # Find node associated with each parent (works for both bitcoin and iota).
-                if None not in [p[0] for p in parents]:
-                    assert tx_to_add.hash not in self.chain_pointers  # Make sure I've never seen this tx before.
-                    tx_to_add.addEvent(self.simulation.tick, self.id, transaction.State.PRE_CONSENSUS)
-                    self.chain_pointers[tx_to_add.hash] = node_to_add
-                    to_broadcast.append(tx_to_add)
-                    for parent, pointer in parents:
-                        assert node_to_add not in parent.children
-                        parent.children.append(node_to_add)
-                        new_depth = parent.depth + 1
-                        if new_depth > node_to_add.depth:
-                            node_to_add.depth = new_depth
-                        node_to_add.reachable |= set([parent]) | parent.reachable  # Only needed in Iota.
-                        if parent in self.frontier_nodes:
-                            self.frontier_nodes.remove(parent)
-                    self.frontier_nodes.add(node_to_add)
-                    chain_changed = True
-                    nodes_to_add.remove(node_to_add)  # Remove from nodes_to_add as we go, copy to self.orphan_nodes at the end.
-                    index -= 1
-                elif first:  # Only for new orphan.
-                    assert sender_id != self.id  # I'm processing a node I just created but I should never have created an orphan.
-                    for parent, pointer in parents:
-                        if parent is None:
-                            self.sendRequest(sender_id, pointer)
-                index += 1
-                first = False
-            if not chain_changed:
-                break
-        self.orphan_nodes = nodes_to_add  # Leftover nodes are orphans.
+        ready = [(0, None, new_node)]
+        while ready:
+            scan_pass, order, node_to_add = heapq.heappop(ready)
+            self.connectNode(node_to_add)
+            to_broadcast.append(node_to_add.tx)
+            woken = self.waiting_orphans.pop(node_to_add.tx.index, [])
+            if woken and self.simulation.profile is not None:
+                self.simulation.profile.orphan_rescans += len(woken)
+            for orphan in woken:
+                orphan_order, orphan_missing = self.orphan_nodes[orphan]
+                if orphan_missing > 1:
+                    self.orphan_nodes[orphan][1] = orphan_missing - 1
+                    continue
+                del self.orphan_nodes[orphan]
+                self.orphan_indices.remove(orphan.tx.index)
+                heapq.heappush(ready, (scan_pass if order is None or orphan_order > order else scan_pass + 1, orphan_order, orphan))
         return to_broadcast
 
-    def checkTxRecursion(self, node, max_depth=-99, curr_depth=0):
-        """Recursive function with dual functionality:
-        Always returns maximum depth of the chain.
-        If maxDepth is > 0, will also mark tx as accepted if they are in the deepest chain and at least as deep as the accept depth (will also add sheep to self.reissue_ids if appropriate).
+    def connectNode(self, node_to_add):
+        """Connects a node whose parents are all in the chain.
+
+        Arguments:
+            node_to_add {Node} -- Node to connect.
+        """
+
+        tx_to_add = node_to_add.tx
+        assert tx_to_add.index not in self.chain_pointers  # Make sure I've never seen this tx before.
+        self.simulation.event_log.record(self.simulation.tick, self.id, tx_to_add.index, transaction.State.PRE_CONSENSUS)
+        self.chain_pointers[tx_to_add.index] = node_to_add
+        for parent in node_to_add.parents:
+            assert parent.tx.index in self.chain_pointers
+            if parent in self.frontier_nodes:
+                self.frontier_nodes.remove(parent)
+        self.frontier_nodes.add(node_to_add)
+        self.indexNewNode(node_to_add)
+
+    def indexNewNode(self, node):
+        """Updates the fork-choice index for a node that was just connected to the chain.
+
+        Arguments:
+            node {Node} -- Newly connected node.
+        """
+
+        self.connection_order[node] = self.next_connection
+        self.next_connection += 1
+        if node.depth > self.max_depth:
+            self.max_depth = node.depth
+            self.deepest_nodes = set([node])
+        elif node.depth == self.max_depth:
+            self.deepest_nodes.add(node)
+        self.id_nodes.setdefault(node.tx.id, []).append(node)
+        if node.tx in self.sheep_tx:
+            self.stray_sheep.add(node)  # Becomes a main node (if it does) on the next check.
+
+    def updateMainNodes(self):
+        """Brings self.main_nodes up to date with self.deepest_nodes by walking only the part of the chain that was reorganized since the last check.
 
+        Returns:
+            tuple(list(Node), list(Node)) -- Nodes that became main nodes and nodes that stopped being main nodes.
+        """
+
+        added = []
+        removed = []
+        for tip in self.deepest_nodes:
+            if tip in self.main_nodes:
+                continue
+            node = tip
+            main_children = 0
+            while node not in self.main_nodes:
+                self.main_nodes[node] = main_children
+                self.main_nodes_by_depth.setdefault(node.depth, set()).add(node)
+                self.stray_sheep.discard(node)
+                added.append(node)
+                main_children = 1  # Every node above the tip has the node we came from.
+                node = node.parents[0]
+            self.main_nodes[node] += 1
+        for tip in self.main_tips - self.deepest_nodes:
+            node = tip
+            while self.main_nodes[node] == 0 and node not in self.deepest_nodes:  # Root always has a main child, so this stops before running off the chain.
+                del self.main_nodes[node]
+                self.main_nodes_by_depth[node.depth].remove(node)
+                if node.tx in self.sheep_tx:
+                    self.stray_sheep.add(node)
+                removed.append(node)
+                node = node.parents[0]
+                self.main_nodes[node] -= 1
+        self.main_tips = set(self.deepest_nodes)
+        return added, removed
+
+    def maxSubtreeDepth(self, node):
+        """
         Arguments:
-            node {Node} -- The current node being examined by the recursive function.
+            node {Node} -- Node whose subtree to search.
 
-        Keyword Arguments:
-            max_depth {int} -- The maximum depth of the chain. (default: {-99})
-            curr_depth {int} -- The current node's depth (post-recursive-call). (default: {0})
+        Returns:
+            int -- Depth of the deepest node in node's subtree (including node itself).
+        """
+
+        deepest = node.depth
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.depth > deepest:
+                deepest = node.depth
+            stack.extend(child for child in node.children if child in self.connection_order)
+        return deepest
+
+    def visitedAfter(self, node, other):
+        """
+        Arguments:
+            node {Node} -- Node in question.
+            other {Node} -- Node to compare against.
 
         Returns:
-            int -- Maximum depth of the chain.
-        """
-
-        if not node.children:
-            # The only portion of the the checks at the end of this function that need to be run on leaf nodes.
-            if max_depth > 0 and node.tx in self.sheep_tx and curr_depth < max_depth - self.simulation.protocol.accept_depth:
-                self.reissue_ids.add(node.tx.id)
-            return curr_depth
-
-        local_max = 0
-        for child in node.children:
-            child_max = self.checkTxRecursion(child, max_depth, curr_depth+1)
-            if child_max > local_max:
-                local_max = child_max
-
-        if max_depth > 0:
-            if local_max == max_depth and local_max - curr_depth >= self.simulation.protocol.accept_depth:
-                if node.tx not in self.consensed_tx:
-                    node.tx.addEvent(self.simulation.tick, self.id, transaction.State.CONSENSUS)
-                    self.consensed_tx.add(node.tx)
-                if node.tx.id in self.reissue_ids:
-                    self.reissue_ids.remove(node.tx.id)  # Consensed, so it doesn't need to be reiussed (this will happen because reissued tx are still saved in old forks).
-            elif local_max != max_depth:
-                if node.tx in self.consensed_tx:
-                    node.tx.addEvent(self.simulation.tick, self.id, transaction.State.DISCONSENSED)
-                    self.consensed_tx.remove(node.tx)
-                # Below: first condition says that it's a sheep on an unaccepted fork, second condition says whether it's time to rebroadcast (max depth of fork is 6+ deep).
-                if node.tx in self.sheep_tx and local_max < max_depth - self.simulation.protocol.accept_depth:
-                    self.reissue_ids.add(node.tx.id)  # The order these will be added to reissue is leaf-up.
-        return local_max
+            bool -- True if a depth-first post-order walk from root (children in the order this miner connected them) reaches node after other, False otherwise.
+        """
+
+        node_branch = other_branch = None  # Last node on the way up from node/other, i.e. the child of the common ancestor each one is under.
+        while node.depth > other.depth:
+            node_branch, node = node, node.parents[0]
+        while other.depth > node.depth:
+            other_branch, other = other, other.parents[0]
+        while node is not other:
+            node_branch, node = node, node.parents[0]
+            other_branch, other = other, other.parents[0]
+        if other_branch is None:  # other is node or one of its descendants.
+            return False
+        if node_branch is None:  # node is an ancestor of other.
+            return True
+        return self.connection_order[node_branch] > self.connection_order[other_branch]
 
     # ==Overwritten methods============
 
@@ -169,19 +249,18 @@ class Bitcoin(miner.Miner):
             Tx -- Newly created transaction.
         """
 
-        sorted_fronts = sorted(self.frontier_nodes, reverse=True, key=lambda n: n.depth)
-        parent_choices = [n for n in sorted_fronts if n.depth == sorted_fronts[0].depth]  # Only consider the deepest frontier nodes.
-        parent = random.choice(parent_choices)
-        new_tx = transaction.Tx(self.simulation.tick, self.id, self.id_bag.getNextId(), [parent.tx.hash])
+        parent_choices = self.deepest_nodes  # Only consider the deepest frontier nodes (a node at max depth can't have children, so these are all of them).
+        parent = random.choice(sorted(parent_choices, key=lambda n: n.tx.index))  # Tips in creation order, so each draw picks the same tip.
+        new_tx = transaction.Tx(self.simulation.tick, self.id, self.id_bag.getNextId(), [parent.tx.index])
+        self.simulation.registerTx(new_tx)
         self.sheep_tx.add(new_tx)
-        self.simulation.all_tx.append(new_tx)
         return new_tx
 
     def checkReissues(self):
         """Miner adds any ids that need to be reiussed to its idBag.
         """
 
-        for i in self.reissue_ids:
+        for i in sorted(self.reissue_ids):  # Lowest id first, so the bag hands them out in a fixed order.
             self.id_bag.addId(i, self)
 
     def hasSheep(self):
@@ -194,6 +273,14 @@ class Bitcoin(miner.Miner):
             return True
         return False
 
+    def countOrphans(self):
+        """
+        Returns:
+            int -- Number of tx the miner has received but can't connect to its chain yet.
+        """
+
+        return len(self.orphan_nodes)
+
     def processNewTx(self, new_tx, sender_id):
         """Add new_tx to the miner's view of the blockchain.
 
@@ -208,14 +295,178 @@ class Bitcoin(miner.Miner):
         return self.addToChain(new_tx, sender_id)
 
     def checkAllTx(self):
-        """Check all nodes for consensus (runs an implicit "tau function" on each node, but all at once because it's faster), and whether sheep need to be reissued.
+        """Check all nodes for consensus (runs an implicit "tau function" on each node, but only on the nodes whose answer can have changed since the last check), and whether sheep need to be reissued.
         """
 
         self.reissue_ids = set()  # Only reset when you checkAll so that it stays full.
-        max_depth = self.checkTxRecursion(self.root)
-        if max_depth < self.simulation.protocol.accept_depth:
+        added, removed = self.updateMainNodes()
+        if self.simulation.profile is not None:
+            self.simulation.profile.nodes_visited += len(added) + len(removed) + len(self.stray_sheep)
+        max_depth = self.max_depth
+        accept_depth = self.simulation.protocol.accept_depth
+        if max_depth < accept_depth or max_depth <= 0:
             return
-        self.checkTxRecursion(self.root, max_depth)
+
+        # Main nodes at least accept_depth above the deepest node are consensed; the deepest nodes themselves never are.
+        confirmed_depth = min(max_depth - accept_depth, max_depth - 1)
+        newly_confirmed = [node for node in added if node.depth <= self.confirmed_depth]
+        for depth in range(self.confirmed_depth + 1, confirmed_depth + 1):
+            newly_confirmed.extend(self.main_nodes_by_depth.get(depth, ()))
+        self.confirmed_depth = confirmed_depth
+        if self.simulation.profile is not None:
+            self.simulation.profile.nodes_visited += len(newly_confirmed)
+        for node in newly_confirmed:
+            if node.tx not in self.consensed_tx:
+                self.simulation.event_log.record(self.simulation.tick, self.id, node.tx.index, transaction.State.CONSENSUS)
+                self.consensed_tx.add(node.tx)
+        for node in removed:
+            if node.tx in self.consensed_tx:
+                self.simulation.event_log.record(self.simulation.tick, self.id, node.tx.index, transaction.State.DISCONSENSED)
+                self.consensed_tx.remove(node.tx)
+
+        # A sheep needs reissuing once everything under it is accept_depth behind the deepest node.
+        # A consensed node with the same id (this will happen because reissued tx are still saved in old forks) cancels that, but only if it comes later in a depth-first post-order walk from root.
+        for sheep in self.stray_sheep:
+            if sheep.tx.id in self.reissue_ids or sheep.depth >= max_depth - accept_depth or self.maxSubtreeDepth(sheep) >= max_depth - accept_depth:
+                continue
+            if not self.isReissueCancelled(sheep):
+                self.reissue_ids.add(sheep.tx.id)
+
+        if self.prune_distance is not None:
+            self.pruneChain()
+
+    def isReissueCancelled(self, sheep):
+        """
+        Arguments:
+            sheep {Node} -- Node of a stray sheep.
+
+        Returns:
+            bool -- True if a consensed main node with the sheep's id comes later in a depth-first post-order walk from root (or was pruned, which makes it an ancestor), False otherwise.
+        """
+
+        for node in self.id_nodes[sheep.tx.id]:
+            if node in self.main_nodes and node.depth <= self.confirmed_depth and self.visitedAfter(node, sheep):
+                return True
+        return sheep.tx.id in self.final_ids
+
+    def pruneChain(self):
+        """Makes the main node prune_distance above the deepest node the new root and drops every node that isn't below it: its ancestors and the dead side branches.
+        Waits for a later check while the common ancestor of the deepest nodes is higher up, while a dropped sheep could still need reissuing,
+        or while a competing fork that doesn't go through the new root is within prune_distance of the deepest node (a connected tip, or an orphan whose ancestors haven't arrived yet).
+        A fork that is further behind is dropped, but if it catches up after all, restorePruned puts its blocks back.
+        """
+
+        depth = self.max_depth - self.prune_distance
+        if depth <= self.root.depth or len(self.main_nodes_by_depth.get(depth, ())) != 1:
+            return
+        checkpoint = next(iter(self.main_nodes_by_depth[depth]))
+        for tip in self.frontier_nodes:
+            if tip.depth > depth and tip not in self.main_nodes:  # Main nodes below depth are all below the checkpoint.
+                node = tip
+                while node.depth > depth:
+                    node = node.parents[0]
+                if node is not checkpoint:
+                    return
+        for orphan in self.orphan_nodes:
+            if orphan.depth > depth:
+                return
+
+        pruned = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node in self.stray_sheep and not self.isReissueCancelled(node):
+                return
+            pruned.append(node)
+            stack.extend(child for child in node.children if child in self.connection_order and child is not checkpoint)
+
+        for node in pruned:
+            del self.chain_pointers[node.tx.index]
+            del self.connection_order[node]
+            self.frontier_nodes.discard(node)
+            self.consensed_tx.discard(node.tx)
+            if node.tx in self.sheep_tx:
+                self.sheep_tx.remove(node.tx)
+                self.pruned_sheep.add(node.tx.index)
+            self.stray_sheep.discard(node)
+            if node in self.main_nodes:
+                del self.main_nodes[node]
+                self.main_nodes_by_depth[node.depth].remove(node)
+                if not self.main_nodes_by_depth[node.depth]:
+                    del self.main_nodes_by_depth[node.depth]
+                self.final_ids.add(node.tx.id)
+            same_id_nodes = self.id_nodes[node.tx.id]
+            same_id_nodes.remove(node)
+            if not same_id_nodes:
+                del self.id_nodes[node.tx.id]
+        self.root = checkpoint
+
+    def isPruned(self, index):
+        """
+        Arguments:
+            index {int} -- Index of a tx.
+
+        Returns:
+            bool -- True if the tx was seen but is neither in the chain nor an orphan, i.e. it was pruned, False otherwise.
+        """
+
+        return index in self.seen_tx and index not in self.chain_pointers and index not in self.orphan_indices
+
+    def restorePruned(self, pruned_node, new_node):
+        """Puts pruned blocks back so that a tx building on pruned_node can be connected (a fork that was written off caught up after all).
+        The common ancestor of pruned_node and the root becomes the root again, and everything below it that was pruned is back in the chain the way it was:
+        the old root's ancestors as consensed main nodes, the side branches off them as they were, and pruned sheep as sheep again.
+        The restored nodes get new connection orders, by tx index.
+
+        Arguments:
+            pruned_node {Node} -- Pruned node that a new tx builds on.
+            new_node {Node} -- Node of the new tx (already in seen_tx, but not to be restored).
+        """
+
+        ancestor = pruned_node
+        main_node = self.root
+        while ancestor.depth > main_node.depth:
+            ancestor = ancestor.parents[0]
+        while main_node.depth > ancestor.depth:
+            main_node = main_node.parents[0]
+        while ancestor is not main_node:
+            ancestor = ancestor.parents[0]
+            main_node = main_node.parents[0]
+
+        restored = []
+        stack = [ancestor]
+        while stack:
+            node = stack.pop()
+            restored.append(node)
+            stack.extend(child for child in node.children if child is not new_node and self.isPruned(child.tx.index))
+        main_path = set()  # The old root's restored ancestors.
+        node = self.root
+        while node is not ancestor:
+            node = node.parents[0]
+            main_path.add(node)
+
+        for node in sorted(restored, key=lambda n: n.tx.index):
+            self.chain_pointers[node.tx.index] = node
+            self.indexNewNode(node)
+            if node.tx.index in self.pruned_sheep:
+                self.pruned_sheep.discard(node.tx.index)
+                self.sheep_tx.add(node.tx)
+                if node not in main_path:
+                    self.stray_sheep.add(node)
+            if node in main_path:
+                self.main_nodes[node] = 1
+                self.main_nodes_by_depth[node.depth] = set([node])
+                self.consensed_tx.add(node.tx)
+        for node in restored:
+            if not any(child in self.connection_order for child in node.children):
+                self.frontier_nodes.add(node)
+        self.root = ancestor
+
+        self.final_ids = Bitset()
+        node = ancestor
+        while node.parents:
+            node = node.parents[0]
+            self.final_ids.add(node.tx.id)
 
     def removeSheep(self, sheep_id):
         """Overseer will call this to tell the miner that it doesn't have to shepherd an id anymore.
@@ -231,5 +482,8 @@ class Bitcoin(miner.Miner):
                 break
         if target_sheep:
             self.sheep_tx.remove(target_sheep)
+            sheep_node = self.findInChain(target_sheep.index)
+            if sheep_node:
+                self.stray_sheep.discard(sheep_node)
         if sheep_id in self.reissue_ids:
             self.reissue_ids.remove(sheep_id)
@@ -15,7 +15,7 @@ class Iota(bitcoin.Bitcoin):
         Arguments:
             miner_id {int} -- Miner's id.
             genesis_tx {Tx} -- Blockchain protocol's genesis transaction.
-            graph {networkx.Graph} -- Graph of network being simulated.
+            graph {networkx.Graph|Network} -- Graph of network being simulated.
             simulation {Simulation} -- Simulation object that stores settings and simulation variables.
             power {int} -- Miner's power relative to other miners.
         """
@@ -28,7 +28,7 @@ class Iota(bitcoin.Bitcoin):
             list(Tx) -- List of 1 or 2 parent tx for new tx.
         """
 
-        node_choices = list(self.frontier_nodes)
+        node_choices = sorted(self.frontier_nodes, key=lambda n: n.tx.index)  # Frontier in creation order, so the random picks below index the same tx.
         if self.root in node_choices and len(node_choices) >= 3:
             node_choices.remove(self.root)
         choices = [choice.tx for choice in node_choices]
@@ -53,11 +53,23 @@ class Iota(bitcoin.Bitcoin):
             bool -- True if node is reachable by all frontier nodes
         """
 
-        for front in list(self.frontier_nodes):
-            if node not in front.reachable:
+        bit = 1 << node.tx.index
+        for front in self.frontier_nodes:
+            if not front.ancestors & bit:
                 return False
         return True
 
+    def reachableByAllFrontiersBits(self):
+        """
+        Returns:
+            int|long -- Bitset of the tx indexes of all nodes reachable by all frontier nodes.
+        """
+
+        common = -1  # All bits set.
+        for front in self.frontier_nodes:
+            common &= front.ancestors
+        return common
+
     def needsReissue(self, node):
         """
         Arguments:
@@ -74,6 +86,21 @@ class Iota(bitcoin.Bitcoin):
 
     # ==Overwritten methods============
 
+    def indexNewNode(self, node):
+        """Records the ancestors of a node that was just connected to the chain as a bitset (instead of a set of nodes, which would make memory quadratic in the number of tx).
+        Ancestors are the same in every miner's view, so only the first miner to connect the shared node computes them.
+        Iota doesn't use Bitcoin's fork-choice index, so this replaces it.
+
+        Arguments:
+            node {Node} -- Newly connected node.
+        """
+
+        if node.ancestors is None:
+            ancestors = 0
+            for parent in node.parents:
+                ancestors |= parent.ancestors | (1 << parent.tx.index)
+            node.ancestors = ancestors
+
     def makeTx(self):
         """Makes a new transaction, connects it to the chain, and returns it.
 
@@ -85,12 +112,12 @@ class Iota(bitcoin.Bitcoin):
         parents = self.getNewParents()
         assert parents  # Should always have at least one (genesis tx).
         for parent in parents:
-            parent_hash = parent.hash
-            assert parent_hash in self.chain_pointers
-            pointers.append(parent_hash)
+            parent_index = parent.index
+            assert parent_index in self.chain_pointers
+            pointers.append(parent_index)
         new_tx = transaction.Tx(self.simulation.tick, self.id, self.id_bag.getNextId(), pointers)
+        self.simulation.registerTx(new_tx)
         self.sheep_tx.add(new_tx)
-        self.simulation.all_tx.append(new_tx)
         return new_tx
 
     def checkAllTx(self):
@@ -98,16 +125,19 @@ class Iota(bitcoin.Bitcoin):
         """
 
         self.reissue_ids = set()  # Only reset when you checkAll so that it stays full!
+        common = self.reachableByAllFrontiersBits()
+        if self.simulation.profile is not None:
+            self.simulation.profile.nodes_visited += len(self.chain_pointers)
         for node in self.chain_pointers.values():
-            if self.reachableByAllFrontiers(node):
+            if common >> node.tx.index & 1:
                 if node.tx not in self.consensed_tx:
-                    node.tx.addEvent(self.simulation.tick, self.id, transaction.State.CONSENSUS)
+                    self.simulation.event_log.record(self.simulation.tick, self.id, node.tx.index, transaction.State.CONSENSUS)
                     self.consensed_tx.add(node.tx)
                 if node.tx.id in self.reissue_ids:
                     self.reissue_ids.remove(node.tx.id)
             else:
                 if node.tx in self.consensed_tx:
-                    node.tx.addEvent(self.simulation.tick, self.id, transaction.State.DISCONSENSED)
+                    self.simulation.event_log.record(self.simulation.tick, self.id, node.tx.index, transaction.State.DISCONSENSED)
                     self.consensed_tx.remove(node.tx)
                 # This reissue strategy doesn't work because we don't know how much time to give a tx in Iota.
                 #   In Bitcoin, for example, we know to wait until the chain is 6+ deep to check reissues.
@@ -0,0 +1,125 @@
+import json
+import networkx as nx
+import numpy
+
+from event_log import EventLog
+from json_endec import GraphDecoder
+from transaction import State
+
+
+def loadGraph(fname):
+    """Loads only the graph from a run's data file (.json or .npz).
+
+    Arguments:
+        fname {str} -- File name of data written by Simulation.writeData.
+
+    Returns:
+        networkx.Graph -- The run's graph.
+    """
+
+    if fname.endswith('.npz'):
+        with numpy.load(fname) as archive:
+            return graphFromArchive(archive)
+    with open(fname, 'r') as infile:
+        return json.load(infile, cls=GraphDecoder)['graph']
+
+
+def graphFromArchive(archive):
+    """
+    Arguments:
+        archive {numpy.lib.npyio.NpzFile} -- Archive written by Simulation.writeNpz.
+
+    Returns:
+        networkx.Graph -- The run's graph.
+    """
+
+    graph = nx.Graph()
+    graph.add_nodes_from(archive['graph_nodes'].tolist())
+    edges = archive['graph_edges']
+    graph.add_edges_from(zip(edges[:, 0].tolist(), edges[:, 1].tolist()))  # Much faster than converting the (edges x 2) array row by row.
+    return graph
+
+
+def loadEvents(fname, load_graph=False):
+    """Loads a run's data file (.json or .npz) as flat event columns, grouped by tx id in the order compileData condenses histories in.
+
+    Arguments:
+        fname {str} -- File name of data written by Simulation.writeData.
+
+    Keyword Arguments:
+        load_graph {bool} -- Whether to rebuild the run's graph; skipping it saves time when only the events are needed. (default: {False})
+
+    Returns:
+        (networkx.Graph|None, dict) -- The run's graph (None unless load_graph), and a dictionary mapping column name (tx_ids, time_stamps, miner_ids, states) to a numpy array with one entry per event; states are State values.
+    """
+
+    if fname.endswith('.npz'):
+        with numpy.load(fname) as archive:
+            graph = graphFromArchive(archive) if load_graph else None
+            tx_indices = archive['tx_indices']
+            ids = archive['tx_ids'][tx_indices]
+            # Group events by id, then by issue (tx index), keeping recorded order within an issue.
+            order = numpy.lexsort((numpy.arange(len(ids)), tx_indices, ids))
+            return graph, {
+                'tx_ids': ids[order],
+                'time_stamps': archive['time_stamps'][order],
+                'miner_ids': archive['miner_ids'][order],
+                'states': archive['states'][order]
+            }
+
+    with open(fname, 'r') as infile:
+        raw_data = json.load(infile, cls=GraphDecoder) if load_graph else json.load(infile)  # Without the decoder the graph stays as plain node-link data.
+    graph = raw_data['graph'] if load_graph else None
+    state_values = {state.name: state.value for state in State}
+    ids = []
+    time_stamps = []
+    miner_ids = []
+    states = []
+    for tx_id in sorted(int(tx_id_str) for tx_id_str in raw_data['tx_histories']):
+        history = raw_data['tx_histories'][str(tx_id)]
+        ids += [tx_id] * len(history)
+        for time_stamp, miner_id, state_name in history:
+            time_stamps.append(time_stamp)
+            miner_ids.append(EventLog.NO_MINER if miner_id is None else miner_id)
+            states.append(state_values[state_name])
+    return graph, {
+        'tx_ids': numpy.array(ids, dtype=numpy.int64),
+        'time_stamps': numpy.array(time_stamps),
+        'miner_ids': numpy.array(miner_ids, dtype=numpy.int64),
+        'states': numpy.array(states, dtype=numpy.int8)
+    }
+
+
+def loadRun(fname):
+    """Loads a run's data file (.json or .npz) into the same shape either way.
+
+    Arguments:
+        fname {str} -- File name of data written by Simulation.writeData.
+
+    Returns:
+        (networkx.Graph, dict) -- The run's graph, and a dictionary mapping tx id to its condensed history of (time_stamp, miner_id, state name) events.
+    """
+
+    graph, events = loadEvents(fname, load_graph=True)
+    state_names = {state.value: state.name for state in State}
+    ids = events['tx_ids']
+    time_stamps = events['time_stamps'].tolist()
+    miner_ids = events['miner_ids'].tolist()
+    states = events['states'].tolist()
+    tx_histories = {}
+    for start, end in groupBounds(ids):
+        tx_histories[int(ids[start])] = [(time_stamps[i], None if miner_ids[i] == EventLog.NO_MINER else miner_ids[i], state_names[states[i]]) for i in xrange(start, end)]
+    return graph, tx_histories
+
+
+def groupBounds(keys):
+    """
+    Arguments:
+        keys {numpy.ndarray} -- Array in which equal keys are contiguous.
+
+    Returns:
+        list((int, int)) -- (start, end) slice bounds of each run of equal keys.
+    """
+
+    bounds = [0] + (numpy.flatnonzero(numpy.diff(keys)) + 1).tolist() + [len(keys)]
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if start != end]
@@ -1,11 +1,24 @@
+import copy
+import gc
 import json
 import logging
+import networkx as nx
+import numpy
 import os
 import random
+import timeit
 
+from dag import Node
+from event_log import EventLog
+from event_queue import EventQueue
 from id_bag import IdBag
 from json_endec import GraphEncoder
+from network import Adjacencies, Network
+from profiling import Phase, Profile
+from simulation_settings import OutputFormat, SimulationEngine
+from telemetry import Telemetry
 import transaction
+from weighted_sampler import WeightedSampler
 
 
 def addToTimes(times, miner_id, time, max_time):
@@ -30,51 +43,61 @@ def addToTimes(times, miner_id, time, max_time):
     return max_time
 
 
-def weightedRandomChoice(choices):
-    """    
-    Arguments:
-        choices {list(tuple)} -- List of (choice, weight) tuples.
-
-    Returns:
-        any -- One selected choice from choices selected according to a weighted random choice.
-    """
-
-    total_weights = sum(weight for choice, weight in choices)
-    target = random.uniform(0, total_weights)
-    current = 0
-    for choice, weight in choices:
-        if current + weight >= target:
-            return choice
-        current += weight
-    assert False
-
-
 class Simulation:
-    def __init__(self, settings, graph, thread_id=0):
+    def __init__(self, settings, graph, thread_id=0, seed=None):
         """Sets up a single run of the simulation with the given settings and graph
 
         Arguments:
             settings {SimulationSettings} -- Stores all settings for the run.
-            graph {networkx.Graph} -- Graph object to run the simulation on; should have edge delays.
+            graph {networkx.Graph|Network} -- Graph object to run the simulation on; should have edge delays. Only read, so runs can share it.
 
         Keyword Arguments:
-            thread_id {int} -- The thread number of this run of the simulation (used for IdBag). (default: {0})
+            thread_id {int} -- The thread number of this run of the simulation. (default: {0})
+            seed {int} -- Seed the random number generators were seeded with for this run; recorded in the output. (default: {None})
         """
 
         self.thread_id = thread_id
+        self.seed = seed
+        self.single_id_bag = None  # IdBag shared by all miners if the protocol uses one (see id_bag.getSingleBag).
         self.tick = -1
-        self.all_tx = []
+        self.all_tx = []  # Registry of every tx created, indexed by tx.index.
+        self.dag = []  # Node of every tx in the DAG shared by all miners (see dag.Node), indexed by tx.index.
         self.completed = False
         self.json_data = None
         self.next_id = 1  # Starts at 1 because genesis tx is 0.
         self.settings = settings
         self.protocol = settings.protocol
         self.graph = graph
-
-        self.attachMiners()
+        self.miners = {}  # Maps graph node to the miner on it; filled in by attachMiners().
+        self.target_termination_ticks = -1  # Tick by which the run has to end, set by the settings' shouldTerminate() once the termination condition is met.
+        self.continuous_time = settings.engine == SimulationEngine.CONTINUOUS_EVENT
+        self.event_queue = None  # Only used by the event-driven engines.
+        self.arrivals = {}  # Maps tick to miners with messages arriving on it (only used by the TICK engine).
+        self.handling = None  # Miner whose messages the TICK engine is handling, while it is (see Miner.pushMsg).
+        self.msgs_in_flight = 0  # Messages sent but not yet received.
+        self.miner_sampler = None  # Picks the miner that generates the next tx, weighted by power; built by runSimulation().
+        self.miner_positions = {}  # Maps miner to its index in miner_sampler.
+        if settings.engine != SimulationEngine.TICK:
+            self.event_queue = EventQueue(self.continuous_time)
+        self.event_log = EventLog(self.continuous_time)  # Every tx's event history.
+        self.profile = Profile() if settings.profile else None  # Everything that updates it checks for None first, so runs without profiling only pay for that check.
+        self.telemetry = None  # Opened by runSimulation() if the settings ask for telemetry.
+
+        start = timeit.default_timer()
+        gc_enabled = gc.isenabled()
+        gc.disable()  # Setup only allocates long-lived objects, so the cyclic collector's passes over the growing heap would be wasted (they took over half of the setup time).
+        try:
+            self.attachMiners()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if self.profile is not None:
+            self.profile.setup_seconds = timeit.default_timer() - start
 
     def attachMiners(self):
-        """Creates Miner objects (including calculating power) and attaches them to graph nodes, then populates miner adjacencies.
+        """Creates Miner objects (including calculating power) for the graph nodes, then populates miner adjacencies.
+        Distributions are copied before sampling from them because they keep sampling state, and the settings and graph are shared by runs.
+        On a Network, each miner gets a network.Adjacencies over its row of the shared arrays instead of a dict of its neighbors.
         """
 
         top_powers = []
@@ -86,18 +109,54 @@ class Simulation:
             top_powers = [percent*power_to_percent_ratio for percent in self.settings.top_miner_power]
 
         genesis_tx = transaction.Tx(-1, None, 0, [])
-        self.all_tx.append(genesis_tx)
-        for node_index in self.graph.nodes:
+        self.registerTx(genesis_tx)
+        power_distribution = copy.copy(self.settings.miner_power_distribution)
+        node_indices = self.graphNodes()
+        for node_index in node_indices:
             if node_index > len(top_powers) - 1:
-                power = self.settings.miner_power_distribution.sample()
+                power = power_distribution.sample()
             else:
                 power = top_powers[node_index]
-            new_miner = self.protocol.getMinerClass()(node_index, genesis_tx, self.graph, self, power)
-            self.graph.nodes[node_index]['miner'] = new_miner
+            self.miners[node_index] = self.protocol.getMinerClass()(node_index, genesis_tx, self.graph, self, power)
+
+        if isinstance(self.graph, Network):
+            miners = [self.miners[node_index] for node_index in node_indices]  # By position in the network.
+            delays = [copy.copy(delay) for delay in self.graph.delays]
+            for position, miner in enumerate(miners):
+                miner.adjacencies = Adjacencies(self.graph, position, miners, delays)
+            return
+
+        delays = {}  # Maps id of a delay distribution on the graph's edges to this run's copy of it (usually all edges share one).
+        for node_index, edges in self.graph.adjacency():
+            adjacencies = {}
+            for edge_index, edge in sorted(edges.items()):  # Sorted so that a seeded run doesn't depend on how the graph was built (e.g. generated or loaded from the topology cache).
+                delay = delays.get(id(edge['network_delay']))
+                if delay is None:
+                    delay = delays[id(edge['network_delay'])] = copy.copy(edge['network_delay'])
+                adjacencies[edge_index] = (self.miners[edge_index], delay)
+            self.miners[node_index].adjacencies = adjacencies
+
+    def graphNodes(self):
+        """
+        Returns:
+            list(int) -- Ids of the miners, in the graph's node order.
+        """
+
+        if isinstance(self.graph, Network):
+            return self.graph.nodes.tolist()
+        return list(self.graph.nodes)
+
+    def registerTx(self, tx):
+        """Adds a newly created tx to the simulation-wide registry and DAG, gives it a dense integer index and records its creation.
+
+        Arguments:
+            tx {Tx} -- Newly created transaction.
+        """
 
-        for node_index in self.graph.nodes:
-            edges = self.graph[node_index]
-            self.graph.nodes[node_index]['miner'].adjacencies = {edge_index: (self.graph.nodes[edge_index]['miner'], edges[edge_index]['network_delay']) for edge_index in edges}
+        tx.index = len(self.all_tx)
+        self.all_tx.append(tx)
+        self.dag.append(Node(tx, [self.dag[pointer] for pointer in tx.pointers]))
+        self.event_log.record(tx.birthday, tx.origin, tx.index, transaction.State.CREATED)
 
     def runSimulation(self):
         """Run simulation on self.graph according to self.settings.
@@ -106,53 +165,218 @@ class Simulation:
         if self.completed:  # Don't run the sim more than once.
             return
 
-        miners = []
-        miner_choices = []
-        for node_index in self.graph.nodes:
-            miner = self.graph.nodes[node_index]['miner']
-            miners.append(miner)
-            miner_choices.append((miner, miner.power))
+        start = timeit.default_timer()
+        miners = [self.miners[node_index] for node_index in self.graphNodes()]
+        self.miner_sampler = WeightedSampler(miners, [miner.power for miner in miners])
+        self.miner_positions = {miner: position for position, miner in enumerate(miners)}
+
+        if self.settings.telemetry is not None:
+            self.telemetry = Telemetry(self.settings.telemetry, self.settings.telemetry_interval, self)
+            self.telemetry.send('started')
+        if self.profile is not None:
+            self.profile.start()
+        try:
+            if self.event_queue is None:
+                self.runTicks(miners)
+            else:
+                self.runEvents(miners)
+            self.completed = True
+        finally:
+            if self.telemetry is not None:
+                self.telemetry.send('finished' if self.completed else 'failed')
+                self.telemetry.close()
+        if self.profile is not None:
+            self.profile.run_seconds = timeit.default_timer() - start
+
+    def setMinerPower(self, miner, power):
+        """Changes a miner's power, e.g. for hashrate churn during a run; takes effect from the next tx generation.
+
+        Arguments:
+            miner {Miner} -- Miner whose power changes.
+            power {float} -- New power relative to other miners.
+        """
+
+        miner.power = power
+        if self.miner_sampler is not None:
+            self.miner_sampler.update(self.miner_positions[miner], power)
+
+    def runTicks(self, miners):
+        """Main loop of the TICK engine: advances the clock one tick at a time.
+
+        Arguments:
+            miners {list(Miner)} -- All miners, in graph node order.
+        """
 
         generation_probability = 1.0 / self.settings.protocol.target_ticks_between_generation
+        profile = self.profile
+        telemetry = self.telemetry
 
         self.tick = 0
         changes_since_last_tick = True  # This allows us to skip to tx generation if that's all that needs to be done this tick.
+        # Every other miner would do nothing on a tick, so only these are visited (in the same order as a pass over all miners).
+        changed = set()  # Miners that changed their chain since they last handled messages (pending sheep checks).
+        reissuing = []  # Miners that had ids to reissue after the last pass; only these can have anything in (or need to refill) their bags.
         while True:
             had_changes = changes_since_last_tick
             changes_since_last_tick = False
-            if had_changes:
-                miners_have_msgs = False
-                for miner in miners:
-                    if miner.queue:
-                        miners_have_msgs = True
-                        break
-                if miners_have_msgs:
-                    changes_since_last_tick = True
-                    if self.protocol.isIdBagSingle():
-                        miners[0].id_bag.clear()
-                    for miner in miners:
-                        if not self.protocol.isIdBagSingle():
-                            miner.id_bag.clear()
-                        miner.handleMsgs()  # Process messages, and populate reissues.
-                    for miner in miners:
-                        miner.checkReissues()  # Add reissues to miner.id_bag.
+            arriving = self.arrivals.pop(self.tick, [])
+            if had_changes and self.msgs_in_flight:
+                changes_since_last_tick = True
+                active = set(arriving)
+                active.update(changed)
+                active.update(reissuing)
+                active = sorted(active, key=lambda m: m.id)
+                if profile is not None:
+                    profile.lap(Phase.DELIVER)
+                if self.protocol.isIdBagSingle():
+                    miners[0].id_bag.clear()
+                for miner in active:
+                    if not self.protocol.isIdBagSingle():
+                        miner.id_bag.clear()
+                    self.handling = miner
+                    miner.handleMsgs()  # Process messages, and populate reissues.
+                self.handling = None
+                if profile is not None:
+                    profile.lap(Phase.HANDLE_MSGS)
+                for miner in active:
+                    miner.checkReissues()  # Add reissues to miner.id_bag.
+                changed = set(miner for miner in active if miner.changed_last_step)
+                reissuing = [miner for miner in active if miner.reissue_ids]
+                if profile is not None:
+                    profile.lap(Phase.CHECK_REISSUES)
             # Global PoW roll is much faster. "While" allows for the event that 2+ miners gen tx on the same tick.
             while self.settings.shouldMakeNewTx(self) and random.random() < generation_probability:
                 changes_since_last_tick = True
-                weightedRandomChoice(miner_choices).makeNewTx()
-            if had_changes or changes_since_last_tick:
-                for miner in miners:
-                    miner.flushMsgs()
-
-            if self.settings.shouldTerminate(self):
+                generator = self.miner_sampler.sample()
+                generator.makeNewTx()
+                changed.add(generator)
+            if profile is not None:
+                profile.lap(Phase.GENERATE)
+
+            should_terminate = self.settings.shouldTerminate(self)
+            if profile is not None:
+                profile.lap(Phase.TERMINATION)
+                profile.steps += 1
+            if should_terminate:
                 break
+            if telemetry is not None:
+                telemetry.poll()
 
             self.tick += 1
-        self.completed = True
+
+    def runEvents(self, miners):
+        """Main loop of the DISCRETE_EVENT and CONTINUOUS_EVENT engines: jumps the clock straight to the next message arrival, tx generation or termination deadline.
+        A step does the same work as a TICK engine tick, but only for the miners that receive messages on it.
+
+        Arguments:
+            miners {list(Miner)} -- All miners, in graph node order.
+        """
+
+        profile = self.profile
+        telemetry = self.telemetry
+        self.tick = 0
+        next_generation = self.sampleGenerationGap()
+        reissuing = []  # Miners that had ids to reissue after the last step; only these can have anything in (or need to refill) their bags.
+        while True:
+            due = self.event_queue.popDue(self.tick)
+            if due:
+                if self.protocol.isIdBagSingle():
+                    miners[0].id_bag.clear()
+                else:
+                    for miner in reissuing:
+                        miner.id_bag.clear()
+                recipients = set()
+                for recipient, msg in due:
+                    recipient.queue.setdefault(self.tick, []).append(msg)  # Arrives now, so popMsg() hands it over right away.
+                    recipients.add(recipient)
+                recipients = sorted(recipients, key=lambda m: m.id)  # Same order the TICK engine visits miners in.
+                if profile is not None:
+                    profile.lap(Phase.DELIVER)
+                for miner in recipients:
+                    miner.handleMsgs()  # Process messages, and populate reissues.
+                if profile is not None:
+                    profile.lap(Phase.HANDLE_MSGS)
+                reissuing = sorted(set(reissuing) | set(recipients), key=lambda m: m.id)
+                reissuing = [miner for miner in reissuing if miner.reissue_ids]
+                for miner in reissuing:
+                    miner.checkReissues()  # Add reissues to miner.id_bag.
+                if profile is not None:
+                    profile.lap(Phase.CHECK_REISSUES)
+            while next_generation <= self.tick and self.settings.shouldMakeNewTx(self):
+                generator = self.miner_sampler.sample()
+                generator.makeNewTx()
+                if generator.reissue_ids and generator not in reissuing:
+                    reissuing = sorted(reissuing + [generator], key=lambda m: m.id)
+                next_generation = self.tick + self.sampleGenerationGap()
+            if profile is not None:
+                profile.lap(Phase.GENERATE)
+
+            should_terminate = self.settings.shouldTerminate(self)
+            if profile is not None:
+                profile.lap(Phase.TERMINATION)
+                profile.steps += 1
+            if should_terminate:
+                break
+            if telemetry is not None:
+                telemetry.poll()
+
+            next_tick = self.event_queue.nextTime()
+            if self.settings.shouldMakeNewTx(self) and (next_tick is None or next_generation < next_tick):
+                next_tick = next_generation
+            deadline = self.settings.nextDeadline(self)
+            if deadline is not None and (next_tick is None or deadline < next_tick):
+                next_tick = deadline
+            assert next_tick is not None  # Nothing left to happen, but shouldTerminate() disagrees.
+            self.tick = next_tick
+            if profile is not None:
+                profile.lap(Phase.SCHEDULE)
+
+    def scheduleMiner(self, miner, tick):
+        """Adds miner to the TICK engine's worklist for tick; called once per miner for each tick it has messages arriving on.
+
+        Arguments:
+            miner {Miner} -- Miner with messages arriving on tick.
+            tick {int} -- Arrival tick.
+        """
+
+        if tick in self.arrivals:
+            self.arrivals[tick].append(miner)
+        else:
+            self.arrivals[tick] = [miner]
+
+    def sampleGenerationGap(self):
+        """Samples the time until the next tx is generated, matching the TICK engine's per-tick roll.
+
+        Returns:
+            int|float -- Ticks until the next generation; geometric (may be 0, like 2+ tx in one tick) or, in continuous time, exponential.
+        """
+
+        if self.continuous_time:
+            return numpy.random.exponential(self.settings.protocol.target_ticks_between_generation)
+        return int(numpy.random.geometric(1.0 / self.settings.protocol.target_ticks_between_generation)) - 1
+
+    def largestQueueDepth(self):
+        """
+        Returns:
+            int -- Most messages in flight to any one miner.
+        """
+
+        if self.event_queue is not None:
+            return self.event_queue.largestBacklog()
+        return max([miner.queuedMsgs() for miner in self.miners.values()] or [0])
+
+    def hasMsgsInFlight(self):
+        """
+        Returns:
+            bool -- True if any message has been sent but not yet received, False otherwise.
+        """
+
+        return self.msgs_in_flight > 0
 
     def compileData(self):
         """Condenses transaction histories into one history per id.
         Populates self.json_data with data ready to serialize to JSON:
+            seed: The seed the run's random number generators were seeded with (None if unknown).
             graph: The simulation's networkx.Graph stripped of simulation objects.
             tx_histories: Map of tx id to condensed history of event tuples.
         (Can only be run after simulation is completed.)
@@ -164,39 +388,87 @@ class Simulation:
         if self.json_data:  # Don't generate data more than once.
             return
 
-        first_instances = {}  # Maps id to first isse of that id.
+        histories = self.event_log.historiesByTx(len(self.all_tx))
+        tx_histories = {}  # Maps id to condensed history of all issues of that id.
         for tx in self.all_tx:
-            if tx.id not in first_instances:
-                first_instances[tx.id] = tx
-            elif tx.id in first_instances and first_instances[tx.id].hash != tx.hash:
-                first_instances[tx.id].history += tx.history  # Append tx history to first instance of tx's.
-
-        for edge_id in self.graph.edges:
-            self.graph.edges[edge_id].pop('network_delay', None)
+            if tx.id not in tx_histories:
+                tx_histories[tx.id] = histories[tx.index]
+            else:
+                tx_histories[tx.id] += histories[tx.index]  # Append tx history to first instance of tx's.
 
-        for node_id in self.graph.nodes:
-            self.graph.nodes[node_id].pop('miner', None)
-            self.graph.nodes[node_id].pop('pos', None)
+        if isinstance(self.graph, Network):
+            graph = self.graph.toGraph()
+        else:
+            graph = nx.Graph()  # Copy stripped of network delays and positions, leaving self.graph as it is for other runs.
+            graph.add_nodes_from(self.graph.nodes)
+            graph.add_edges_from(self.graph.edges)
 
         self.json_data = {
-            'graph': self.graph,
-            'tx_histories': {
-                tx_id: [(event.time_stamp, event.miner_id, event.state.name) for event in first_instances[tx_id].history] for tx_id in first_instances
-            }
+            'seed': self.seed,
+            'graph': graph,
+            'tx_histories': tx_histories
         }
 
     def writeData(self, fname):
-        """Writes data pertaining to the completed simulation to a JSON file.
+        """Writes data pertaining to the completed simulation to a file in the settings' output format.
+        If the run was profiled, its profile is written next to it as JSON, with the extension replaced by .profile (see profiling.Profile).
         (Can only be run after simulation is completed.)
 
         Arguments:
-            fname {str} -- File name to write JSON to.
+            fname {str} -- File name to write to.
         """
 
-        self.compileData()
         dir_name = os.path.dirname(fname)
         if not os.path.exists(dir_name):
-            os.makedirs(dir_name)
+            try:
+                os.makedirs(dir_name)
+            except OSError:  # Another run of the batch created it first.
+                if not os.path.isdir(dir_name):
+                    raise
+
+        if self.settings.output_format == OutputFormat.NPZ:
+            self.writeNpz(fname)
+        else:
+            self.writeJson(fname)
+        if self.profile is not None:
+            self.profile.write(os.path.splitext(fname)[0] + '.profile')  # Not .json, which analysis.loadData would take for run data.
+
+    def writeJson(self, fname):
+        """Writes data pertaining to the completed simulation to a JSON file (see compileData).
+        (Can only be run after simulation is completed.)
 
+        Arguments:
+            fname {str} -- File name to write JSON to.
+        """
+
+        self.compileData()
         with open(fname, 'w') as outfile:
             json.dump(self.json_data, outfile, cls=GraphEncoder)
+
+    def writeNpz(self, fname):
+        """Writes data pertaining to the completed simulation to a compressed numpy archive.
+        The event log's columns are written as they are, without building per-tx histories; the archive holds:
+            seed: The seed the run's random number generators were seeded with (empty if unknown).
+            graph_nodes, graph_edges: The simulation's graph as a node list and an (edges x 2) array.
+            tx_ids: Tx id of each registered tx, by tx index.
+            time_stamps, miner_ids, tx_indices, states: The event log's columns (miner id -1 stands for None, states are State values).
+        (Can only be run after simulation is completed.)
+
+        Arguments:
+            fname {str} -- File name to write to (numpy appends .npz if it is missing).
+        """
+
+        if not self.completed:
+            raise Exception("Cannot generate data on a simulation that has not been run.")
+
+        if isinstance(self.graph, Network):
+            graph_edges = self.graph.edges()
+        else:
+            graph_edges = numpy.array(list(self.graph.edges), dtype=numpy.int64).reshape(-1, 2)
+        numpy.savez_compressed(
+            fname,
+            seed=numpy.array([] if self.seed is None else [self.seed], dtype=numpy.int64),
+            graph_nodes=numpy.array(self.graphNodes(), dtype=numpy.int64),
+            graph_edges=graph_edges,
+            tx_ids=numpy.array([tx.id for tx in self.all_tx], dtype=numpy.int64),
+            **self.event_log.toArrays())
@@ -1,6 +1,7 @@
 from enum import Enum
 import json
 import logging
+import math
 from pprint import pformat
 
 from distribution import Distribution
@@ -24,21 +25,66 @@ class TerminationCondition(Enum):
     NUMBER_OF_TIME_TICKS = 2
 
 
+class ExecutionMode(Enum):
+    """Enumeration of how Monte Carlo runs are executed in parallel.
+    """
+
+    THREADS = 1  # One process; the runs only overlap while they wait on I/O.
+    PROCESSES = 2  # One worker process per core (opt-in; runs are independent, so this is the faster choice on multi-core machines).
+
+
+class SimulationEngine(Enum):
+    """Enumeration of the main loops that can drive a simulation.
+    """
+
+    TICK = 1  # Advance the clock one tick at a time.
+    DISCRETE_EVENT = 2  # Jump the clock straight to the next message arrival or tx generation; whole-tick timestamps like TICK.
+    CONTINUOUS_EVENT = 3  # Like DISCRETE_EVENT, but delays and generation times are not rounded to whole ticks.
+
+
+class NetworkRepresentation(Enum):
+    """Enumeration of how the miner graph is held during runs.
+    """
+
+    GRAPH = 1  # networkx.Graph, with a dict of neighbors per miner.
+    CSR = 2  # Compressed sparse row arrays (see network.Network); networkx is only used to generate, load and export the graph. For networks of many thousands of miners.
+
+
+class OutputFormat(Enum):
+    """Enumeration of the file formats a run's data can be written in.
+    """
+
+    JSON = 1  # Graph as node-link data and every history as lists of event tuples.
+    NPZ = 2  # Compressed numpy archive of the event log's columns; much smaller and faster to load (opt-in, since tools reading dataN.json don't understand it).
+
+
 class SimulationSettings:
     """Handles loading simulation settings information from a file.
     """
 
-    def __init__(self, fname):
+    def __init__(self, value):
         """
         Arguments:
-            fname {str} -- Filename to load settings from.
+            value {str|dict} -- If a string, it is the filename to load settings from. If a dict, then it is the settings.
         """
 
-        with open(fname, 'r') as settingsFile:
-            data = json.load(settingsFile)
+        if type(value) is str:
+            with open(value, 'r') as settingsFile:
+                data = json.load(settingsFile)
+        else:
+            data = value
 
         # Load settings.
         self.thread_workers = data['threadWorkers']
+        self.execution_mode = ExecutionMode.THREADS
+        if 'executionMode' in data:
+            self.execution_mode = ExecutionMode[data['executionMode']]
+        self.process_workers = None  # None uses every core.
+        if 'processWorkers' in data:
+            self.process_workers = data['processWorkers']
+        self.seed = None  # Seed for topology generation and for drawing each run's seed; None draws a fresh one.
+        if 'seed' in data:
+            self.seed = data['seed']
         self.number_of_executions = data['numberOfExecutions']
         self.topology_selection = TopologySelection[data['topologySelection']]
         self.termination_condition = TerminationCondition[data['terminationCondition']]
@@ -51,7 +97,32 @@ class SimulationSettings:
         if 'topMinerPower' in data:
             self.top_miner_power = data['topMinerPower']
 
-        self.target_termination_ticks = -1
+        self.engine = SimulationEngine.TICK
+        if 'engine' in data:
+            self.engine = SimulationEngine[data['engine']]
+
+        self.network_representation = NetworkRepresentation.GRAPH
+        if 'networkRepresentation' in data:
+            self.network_representation = NetworkRepresentation[data['networkRepresentation']]
+
+        self.output_format = OutputFormat.JSON
+        if 'outputFormat' in data:
+            self.output_format = OutputFormat[data['outputFormat']]
+
+        self.profile = False  # Whether runs time the phases of their main loop and count messages and checks (see profiling.Profile), and write that next to their output.
+        if 'profile' in data:
+            self.profile = data['profile']
+
+        self.telemetry = None  # File name or "udp://host:port" that runs periodically send a snapshot of their progress to (see Telemetry); None disables it.
+        if 'telemetry' in data:
+            self.telemetry = data['telemetry']
+        self.telemetry_interval = 10.0  # Seconds of wall time between snapshots.
+        if 'telemetryInterval' in data:
+            self.telemetry_interval = data['telemetryInterval']
+
+        self.topology_cache = None  # Directory of the on-disk topology cache (see TopologyCache); None disables it.
+        if 'topologyCache' in data:
+            self.topology_cache = data['topologyCache']
 
         # Parameterize in JSON later?
         self.allow_termination_cooldown = True
@@ -96,15 +167,31 @@ class SimulationSettings:
         elif not self.allow_termination_cooldown:
             return True
 
-        if should_finish and self.target_termination_ticks < 0:  # Set the target if it hasn't been set already.
-            self.target_termination_ticks = simulation.tick + self.hard_limit_ticks
+        if should_finish and simulation.target_termination_ticks < 0:  # Set the target if it hasn't been set already.
+            simulation.target_termination_ticks = simulation.tick + self.hard_limit_ticks
 
-        if simulation.tick > self.target_termination_ticks:
+        if simulation.tick > simulation.target_termination_ticks:
             logging.info("Terminating due to surpassed hard tick limit.")
             return True
 
-        miners_have_msgs = bool([True for node_id in simulation.graph.nodes if simulation.graph.nodes[node_id]['miner'].queue])
-        return not miners_have_msgs
+        return not simulation.hasMsgsInFlight()
+
+    def nextDeadline(self, simulation):
+        """Returns the first tick after the current one at which shouldTerminate() can become True with no messages arriving and no tx being generated.
+        Used by the event-driven engines so that they don't jump the clock past the tick on which the tick engine would have stopped.
+
+        Arguments:
+            simulation {Simulation} -- The simulation in question.
+
+        Returns:
+            int|None -- The tick, or None if only a message arrival or tx generation can end the simulation.
+        """
+
+        if simulation.target_termination_ticks >= 0:
+            return int(math.floor(simulation.target_termination_ticks)) + 1
+        if self.termination_condition == TerminationCondition.NUMBER_OF_TIME_TICKS and not self.shouldFinish(simulation):
+            return int(math.floor(self.termination_value)) + 1
+        return None
 
     def __str__(self):
         """        
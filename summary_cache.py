@@ -0,0 +1,95 @@
+import cPickle as pickle
+import hashlib
+import logging
+import os
+
+
+def contentHash(fname):
+    """
+    Arguments:
+        fname {str} -- File to hash.
+
+    Returns:
+        str -- md5 hex digest of the file's contents.
+    """
+
+    md5 = hashlib.md5()
+    with open(fname, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class SummaryCache:
+    """Persistent store of each data file's reduced analysis results (see analysis.summarizeRun), kept next to the data files.
+    An entry is reused while the file's size and mtime are unchanged; if either changed, it is still reused when the file's content hash matches.
+    """
+
+    FILE_NAME = '.summary_cache.pickle'
+
+    def __init__(self, data_dir):
+        """Loads the cache of data_dir, starting empty if there isn't one or it can't be read.
+
+        Arguments:
+            data_dir {str} -- Directory holding the data files.
+        """
+
+        self.fname = os.path.join(data_dir, SummaryCache.FILE_NAME)
+        self.entries = {}  # Maps data file name to (size, mtime, content hash, summary).
+        self.changed = False
+        if os.path.exists(self.fname):
+            try:
+                with open(self.fname, 'rb') as infile:
+                    self.entries = pickle.load(infile)
+            except Exception:
+                logging.warning("Ignoring unreadable summary cache %s" % self.fname)
+
+    def get(self, fname):
+        """
+        Arguments:
+            fname {str} -- Data file name.
+
+        Returns:
+            dict|None -- The file's cached summary, or None if it isn't cached or the file has changed.
+        """
+
+        if fname not in self.entries:
+            return None
+        size, mtime, content_hash, summary = self.entries[fname]
+        stat = os.stat(fname)
+        if stat.st_size == size and stat.st_mtime == mtime:
+            return summary
+        if stat.st_size == size and contentHash(fname) == content_hash:  # Touched or copied, but not changed.
+            self.entries[fname] = (size, stat.st_mtime, content_hash, summary)
+            self.changed = True
+            return summary
+        return None
+
+    def put(self, fname, summary):
+        """
+        Arguments:
+            fname {str} -- Data file name.
+            summary {dict} -- The file's reduced results.
+        """
+
+        stat = os.stat(fname)
+        self.entries[fname] = (stat.st_size, stat.st_mtime, contentHash(fname), summary)
+        self.changed = True
+
+    def save(self, fnames):
+        """Drops entries for files that are gone and writes the cache if it changed.
+
+        Arguments:
+            fnames {list(str)} -- Data file names that are still present.
+        """
+
+        for fname in set(self.entries) - set(fnames):
+            del self.entries[fname]
+            self.changed = True
+        if not self.changed:
+            return
+        tmp_fname = self.fname + '.tmp'
+        with open(tmp_fname, 'wb') as outfile:
+            pickle.dump(self.entries, outfile, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_fname, self.fname)  # Atomic, so a crash never leaves a half-written cache.
+        self.changed = False
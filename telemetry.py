@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import socket
+import time
+
+import memory_usage
+
+
+class Telemetry:
+    """Periodic snapshots of a running simulation, so that runs whose queues blow up can be spotted (and killed, by the pid in each record) long before they finish.
+    Records are JSON objects, one per line, either appended to a file (one write per record, so every run of a Monte Carlo batch can share the file) or sent as UDP datagrams to "udp://host:port".
+    A file that can't be opened fails the run before it starts; a destination that stops accepting records later on is given up on with a warning, without stopping the run.
+    """
+
+    def __init__(self, destination, interval, simulation):
+        """
+        Arguments:
+            destination {str} -- File name, or "udp://host:port".
+            interval {float} -- Seconds of wall time between records.
+            simulation {Simulation} -- Simulation to report on.
+        """
+
+        self.destination = destination
+        self.interval = interval
+        self.simulation = simulation
+        self.socket = None
+        self.address = None
+        self.fd = None
+        if destination.startswith('udp://'):
+            host, port = destination[len('udp://'):].rsplit(':', 1)
+            self.address = (host, int(port))
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.fd = os.open(destination, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.start_time = self.last_time = time.time()
+        self.next_time = self.start_time + interval
+        self.last_tick = max(simulation.tick, 0)
+        self.last_events = len(simulation.event_log)  # Setup already recorded the genesis tx's events.
+
+    def poll(self):
+        """Sends a record if the interval has passed since the last one; called once per step of the main loop.
+        """
+
+        if time.time() >= self.next_time:
+            self.send('running')
+
+    def record(self, status):
+        """
+        Arguments:
+            status {str} -- started, running, finished or failed.
+
+        Returns:
+            dict -- Snapshot of the simulation, with rates since the previous record.
+        """
+
+        simulation = self.simulation
+        now = time.time()
+        tick = max(simulation.tick, 0)
+        events = len(simulation.event_log)
+        elapsed = now - self.last_time
+        orphans = [miner.countOrphans() for miner in simulation.miners.values()]
+        record = {
+            'status': status,
+            'time': now,
+            'elapsed_seconds': now - self.start_time,
+            'pid': os.getpid(),
+            'thread_id': simulation.thread_id,
+            'seed': simulation.seed,
+            'tick': tick,
+            'ticks_per_second': (tick - self.last_tick) / elapsed if elapsed > 0 else 0.0,
+            'events_per_second': (events - self.last_events) / elapsed if elapsed > 0 else 0.0,
+            'msgs_in_flight': simulation.msgs_in_flight,
+            'max_queue_depth': simulation.largestQueueDepth(),
+            'next_id': simulation.next_id,
+            'tx_count': len(simulation.all_tx),
+            'orphans': sum(orphans),
+            'max_orphans': max(orphans) if orphans else 0,
+            'resident_bytes': memory_usage.residentMemory()
+        }
+        self.last_time = now
+        self.next_time = now + self.interval
+        self.last_tick = tick
+        self.last_events = events
+        return record
+
+    def send(self, status):
+        """Sends a record to the destination.
+
+        Arguments:
+            status {str} -- started, running, finished or failed.
+        """
+
+        if self.fd is None and self.socket is None:  # Given up on.
+            return
+        line = json.dumps(self.record(status), sort_keys=True) + '\n'
+        try:
+            if self.socket is not None:
+                self.socket.sendto(line, self.address)
+            else:
+                os.write(self.fd, line)
+        except (OSError, socket.error) as error:
+            logging.warning("Stopping telemetry to %s: %s" % (self.destination, error))
+            self.close()
+
+    def close(self):
+        """Closes the destination.
+        """
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
@@ -0,0 +1,66 @@
+import collections
+import copy
+import random
+import unittest
+
+import numpy
+
+from simulation import Simulation
+from simulation_settings import SimulationSettings
+
+# Fast generation over slow links, so miners keep forking and forks often run longer than the prune distance.
+FORKY_SETTINGS = {
+    'threadWorkers': 1,
+    'numberOfExecutions': 1,
+    'topologySelection': 'GENERATE_ONCE',
+    'terminationCondition': 'NUMBER_OF_GENERATED_TRANSACTIONS',
+    'terminationValue': 120,
+    'minerPower': {'type': 'CONSTANT', 'value': 1},
+    'topology': {'type': 'GEOMETRIC_UNIFORM_DELAY', 'radius': 0.3, 'numberOfMiners': 40, 'networkDelay': {'type': 'EXPONENTIAL', 'beta': 2.0}},
+    'protocol': {'type': 'BITCOIN', 'acceptDepth': 2, 'targetTicksBetweenGeneration': 2}
+}
+
+SEEDS = [1, 2]
+
+
+def runForky(seed, prune_depth_multiple=None):
+    """
+    Arguments:
+        seed {int} -- Seed for the random number generators.
+
+    Keyword Arguments:
+        prune_depth_multiple {float} -- The protocol's pruneDepthMultiple, or None to not prune. (default: {None})
+
+    Returns:
+        Simulation -- Completed simulation.
+    """
+
+    data = copy.deepcopy(FORKY_SETTINGS)
+    if prune_depth_multiple is not None:
+        data['protocol']['pruneDepthMultiple'] = prune_depth_multiple
+    random.seed(seed)
+    numpy.random.seed(seed)
+    settings = SimulationSettings(data)
+    simulation = Simulation(settings, settings.topology.generateMinerGraph())
+    simulation.runSimulation()
+    return simulation
+
+
+class BitcoinPruningTest(unittest.TestCase):
+
+    def testMinersConverge(self):
+        for seed in SEEDS:
+            simulation = runForky(seed, 2)
+            self.assertFalse(simulation.hasMsgsInFlight())  # Every block reached every miner.
+            tips = set(tuple(sorted(node.tx.index for node in miner.deepest_nodes)) for miner in simulation.miners.values())
+            self.assertEqual(len(tips), 1, "Miners ended on different chains (seed %d)." % seed)
+            self.assertTrue(any(miner.root.depth > 0 for miner in simulation.miners.values()))  # Pruning did happen.
+
+    def testSameEventsAsWithoutPruning(self):
+        for seed in SEEDS:
+            events = [collections.Counter(runForky(seed, multiple).event_log) for multiple in [None, 1]]  # Events of a tick come in set order, which depends on memory addresses.
+            self.assertEqual(events[0], events[1], "Pruning changed the events (seed %d)." % seed)
+
+
+if __name__ == '__main__':
+    unittest.main()
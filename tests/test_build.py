@@ -0,0 +1,36 @@
+import random
+import unittest
+
+import build
+from simulation_settings import SimulationSettings
+
+SETTINGS = {
+    'threadWorkers': 1,
+    'numberOfExecutions': 1,
+    'topologySelection': 'GENERATE_EACH_TIME',
+    'terminationCondition': 'NUMBER_OF_GENERATED_TRANSACTIONS',
+    'terminationValue': 10,
+    'minerPower': {'type': 'CONSTANT', 'value': 1},
+    'topology': {'type': 'GEOMETRIC_UNIFORM_DELAY', 'radius': 0.3, 'numberOfMiners': 40, 'networkDelay': {'type': 'EXPONENTIAL', 'beta': 2.0}},
+    'protocol': {'type': 'BITCOIN', 'acceptDepth': 3, 'targetTicksBetweenGeneration': 8}
+}
+
+
+class TopologySeedTest(unittest.TestCase):
+
+    def testRunDoesNotReplayTopologyDraws(self):
+        settings = SimulationSettings(SETTINGS)
+        for seed in [1, 11, 2**32 - 1]:
+            topology_seed = build.topologySeed(seed)
+            self.assertTrue(0 <= topology_seed < 2**32)
+            graph = build.generateGraph(settings, topology_seed)
+            build.seedRandom(seed)  # What runOnce does before the run.
+            self.assertNotEqual([random.random(), random.random()], list(graph.nodes[0]['pos']))
+
+    def testTopologySeedsDiffer(self):
+        self.assertNotEqual(build.topologySeed(11), build.topologySeed(12))
+        self.assertIsNone(build.topologySeed(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
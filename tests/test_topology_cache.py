@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import build
+from simulation_settings import SimulationSettings
+from topology_cache import TopologyCache
+
+# Small seeded batch whose graphs are generated per run and go through the topology cache.
+BATCH_SETTINGS = {
+    'threadWorkers': 1,
+    'executionMode': 'PROCESSES',
+    'processWorkers': 3,
+    'seed': 11,
+    'numberOfExecutions': 6,
+    'topologySelection': 'GENERATE_EACH_TIME',
+    'outputFormat': 'NPZ',
+    'terminationCondition': 'NUMBER_OF_GENERATED_TRANSACTIONS',
+    'terminationValue': 30,
+    'minerPower': {'type': 'CONSTANT', 'value': 1},
+    'topology': {'type': 'GEOMETRIC_UNIFORM_DELAY', 'radius': 0.3, 'numberOfMiners': 60, 'networkDelay': {'type': 'EXPONENTIAL', 'beta': 2.0}},
+    'protocol': {'type': 'BITCOIN', 'acceptDepth': 3, 'targetTicksBetweenGeneration': 8}
+}
+
+
+class TopologyCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir_name, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def testMissReturnsLoadedGraph(self):
+        data = dict(BATCH_SETTINGS, topologyCache=self.cache_dir)
+        graphs = []
+        for _ in range(2):  # A miss, then a hit.
+            build.seedRandom(5)
+            graphs.append(SimulationSettings(data).topology.generateMinerGraph(TopologyCache(self.cache_dir), 5))
+        self.assertEqual(list(graphs[0].nodes), list(graphs[1].nodes))
+        self.assertEqual(list(graphs[0].edges), list(graphs[1].edges))
+        for node in graphs[0]:
+            self.assertEqual(list(graphs[0][node]), list(graphs[1][node]))  # Miners send to their neighbors in this order.
+
+    def testMissAndHitGiveSameEvents(self):
+        fname = os.path.join(self.dir_name, 'batch.json')
+        with open(fname, 'w') as outfile:
+            json.dump(dict(BATCH_SETTINGS, topologyCache=self.cache_dir), outfile)
+        for out_dir in ['miss', 'hit']:
+            build.runMonteCarlo(fname, os.path.join(self.dir_name, out_dir) + '/')
+            if out_dir == 'miss':
+                self.assertEqual(len(os.listdir(self.cache_dir)), BATCH_SETTINGS['numberOfExecutions'])  # One graph per run, no leftover temporary files.
+        for thread_id in range(BATCH_SETTINGS['numberOfExecutions']):
+            with numpy.load(os.path.join(self.dir_name, 'miss', 'data%d.npz' % thread_id)) as miss:
+                with numpy.load(os.path.join(self.dir_name, 'hit', 'data%d.npz' % thread_id)) as hit:
+                    self.assertEqual(sorted(miss.files), sorted(hit.files))
+                    for name in miss.files:
+                        self.assertTrue(numpy.array_equal(miss[name], hit[name]), "%s differs in run %d." % (name, thread_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import numpy
+import os
+import threading
+
+import run_data
+from summary_cache import contentHash
+from topology_settings import TopologyType
+
+
+class TopologyCache:
+    """Directory of miner graphs stored as uncompressed numpy archives of node and edge arrays, so they load without generating or parsing anything.
+    A graph's file is named after a hash of everything its generation depends on: the topology settings, and the seed the random module was seeded with (or, for a static topology, the content of its file).
+    Files are written atomically, so any number of processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Arguments:
+            cache_dir {str} -- Directory to keep the graphs in; created when the first graph is stored.
+        """
+
+        self.cache_dir = cache_dir
+
+    def key(self, topology, seed):
+        """
+        Arguments:
+            topology {TopologySettings} -- Settings the graph is generated from.
+            seed {int|None} -- Seed the random module was seeded with right before generating.
+
+        Returns:
+            str|None -- Hex digest identifying the graph, or None if it can't be cached (a generated topology without a seed).
+        """
+
+        fields = {'type': topology.topology_type.name}
+        if topology.topology_type == TopologyType.STATIC_UNIFORM_DELAY:
+            fields['file_hash'] = contentHash(topology.static_file)
+        elif seed is None:
+            return None
+        else:
+            fields['seed'] = seed
+            fields['number_of_miners'] = topology.number_of_miners
+            if topology.topology_type == TopologyType.GEOMETRIC_UNIFORM_DELAY:
+                fields['radius'] = topology.radius
+                fields['connectivity'] = topology.connectivity.name
+            elif topology.topology_type == TopologyType.LOBSTER_UNIFORM_DELAY:
+                fields['p1'] = topology.p1
+                fields['p2'] = topology.p2
+        return hashlib.md5(json.dumps(fields, sort_keys=True)).hexdigest()
+
+    def fileName(self, key):
+        """
+        Arguments:
+            key {str} -- Key of a graph (see key).
+
+        Returns:
+            str -- Path of the graph's file.
+        """
+
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def load(self, key):
+        """
+        Arguments:
+            key {str} -- Key of a graph (see key).
+
+        Returns:
+            networkx.Graph|None -- The cached graph (without network delays), or None if it isn't cached.
+        """
+
+        arrays = self.loadArrays(key)
+        if arrays is None:
+            return None
+        return run_data.graphFromArchive(arrays)
+
+    def loadArrays(self, key):
+        """
+        Arguments:
+            key {str} -- Key of a graph (see key).
+
+        Returns:
+            dict|None -- The cached graph's graph_nodes and graph_edges arrays, or None if it isn't cached.
+        """
+
+        fname = self.fileName(key)
+        if not os.path.exists(fname):
+            return None
+        try:
+            with numpy.load(fname) as archive:
+                return {'graph_nodes': archive['graph_nodes'], 'graph_edges': archive['graph_edges']}
+        except Exception:
+            logging.warning("Ignoring unreadable cached topology %s" % fname)
+            return None
+
+    def store(self, key, graph):
+        """Writes a graph to the cache.
+
+        Arguments:
+            key {str} -- Key of the graph (see key).
+            graph {networkx.Graph} -- Graph to store; only its nodes and edges are kept.
+
+        Returns:
+            dict -- The stored graph_nodes and graph_edges arrays, i.e. what loadArrays returns for the key from now on.
+        """
+
+        arrays = {
+            'graph_nodes': numpy.array(list(graph.nodes), dtype=numpy.int64),
+            'graph_edges': numpy.array(list(graph.edges), dtype=numpy.int64).reshape(-1, 2)  # Same layout as in a run's data archive.
+        }
+        if not os.path.exists(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:  # Another process created it first.
+                pass
+        fname = self.fileName(key)
+        tmp_fname = '%s.%d.%d.tmp' % (fname, os.getpid(), threading.current_thread().ident)  # Unique to this writer, even among threads of one process.
+        try:
+            with open(tmp_fname, 'wb') as outfile:
+                numpy.savez(outfile, **arrays)
+            os.rename(tmp_fname, fname)  # Atomic, so readers never see a half-written graph.
+        except Exception:
+            if os.path.exists(tmp_fname):  # Don't leave a partial file behind.
+                os.remove(tmp_fname)
+            raise
+        return arrays
@@ -1,10 +1,13 @@
 from enum import Enum
 import json
+import logging
 import networkx as nx
 from pprint import pformat
 
 from distribution import Distribution
-from json_endec import GraphDecoder
+import geometric_graph
+import network
+import run_data
 
 
 class TopologyType(Enum):
@@ -17,6 +20,15 @@ class TopologyType(Enum):
     # TODO: Add appropraite types
 
 
+class Connectivity(Enum):
+    """Ways of getting a connected graph out of a random geometric graph.
+    """
+
+    REGENERATE = 1  # Generate new graphs until one is connected.
+    LARGEST_COMPONENT = 2  # Keep only the largest connected component (so there can be fewer miners than numberOfMiners).
+    BRIDGE = 3  # Add one edge per extra component, between the closest pair of nodes.
+
+
 class TopologySettings:
     """Stores settings related to graph topologies.
     """
@@ -49,38 +61,93 @@ class TopologySettings:
 
                 if self.topology_type == TopologyType.GEOMETRIC_UNIFORM_DELAY:
                     self.radius = data['radius']
+                    self.connectivity = Connectivity.REGENERATE
+                    if 'connectivity' in data:
+                        self.connectivity = Connectivity[data['connectivity']]
                 elif self.topology_type == TopologyType.LOBSTER_UNIFORM_DELAY:
                     self.p1 = data['p1']
                     self.p2 = data['p2']
             else:
                 raise NotImplementedError("Selected topology type is not implemented.")
+        self.attempts = 0  # Number of graphs the last call to generateMinerGraph generated to get a connected one.
 
-    def generateMinerGraph(self):
+    def generateMinerGraph(self, cache=None, seed=None):
         """Generates a miner graph based on the settings in this object.
+
+        Keyword Arguments:
+            cache {TopologyCache} -- Cache to load the graph from, or to store it in if it isn't there yet. (default: {None})
+            seed {int} -- Seed the random module was just seeded with; generated graphs are only cached if it's given. (default: {None})
+
         Returns:
             networkx.Graph -- Graph of miners to be used in simulation.
         """
 
+        self.attempts = 0
+        key = cache.key(self, seed) if cache is not None else None
+        graph = cache.load(key) if key is not None else None
+        if graph is None:
+            graph = self.buildGraph()
+            if key is not None:
+                graph = run_data.graphFromArchive(cache.store(key, graph))  # The graph a later hit loads, down to the order of its edges (and so of every miner's neighbors).
+        else:
+            logging.info("Loaded a cached graph of %d miners" % graph.number_of_nodes())
+
+        nx.set_edge_attributes(graph, self.network_delay, 'network_delay')
+        return graph
+
+    def generateMinerNetwork(self, cache=None, seed=None):
+        """Like generateMinerGraph, but returns the graph as CSR arrays; a cached graph is loaded straight into them, without going through networkx.
+
+        Keyword Arguments:
+            cache {TopologyCache} -- Cache to load the graph from, or to store it in if it isn't there yet. (default: {None})
+            seed {int} -- Seed the random module was just seeded with; generated graphs are only cached if it's given. (default: {None})
+
+        Returns:
+            Network -- Network of miners to be used in simulation.
+        """
+
+        self.attempts = 0
+        key = cache.key(self, seed) if cache is not None else None
+        arrays = cache.loadArrays(key) if key is not None else None
+        if arrays is None:
+            graph = self.buildGraph()
+            if key is not None:
+                arrays = cache.store(key, graph)
+            else:
+                arrays = {'graph_nodes': list(graph.nodes), 'graph_edges': list(graph.edges)}
+            graph = None  # Frees the networkx graph before the CSR arrays are built.
+        else:
+            logging.info("Loaded a cached graph of %d miners" % len(arrays['graph_nodes']))
+
+        return network.Network(arrays['graph_nodes'], arrays['graph_edges'], [self.network_delay])
+
+    def buildGraph(self):
+        """
+        Returns:
+            networkx.Graph -- Graph of miners without network delays, loaded or freshly generated.
+        """
+
         graph = None
         if self.topology_type == TopologyType.STATIC_UNIFORM_DELAY:
             if not self.static_graph:
-                with open(self.static_file, 'r') as infile:
-                    raw_data = json.load(infile, cls=GraphDecoder)
-                    self.static_graph = raw_data['graph']
+                self.static_graph = run_data.loadGraph(self.static_file)  # Graph of a previous run's data file (.json or .npz).
             graph = self.static_graph
         else:
             while graph is None or not nx.is_connected(graph):
+                self.attempts += 1
                 if self.topology_type == TopologyType.GEOMETRIC_UNIFORM_DELAY or self.topology_type == TopologyType.LOBSTER_UNIFORM_DELAY:
                     # Graphs with uniform delays for message transmission.
                     if self.topology_type == TopologyType.GEOMETRIC_UNIFORM_DELAY:
-                        graph = nx.random_geometric_graph(self.number_of_miners, self.radius)
+                        graph = geometric_graph.randomGeometricGraph(self.number_of_miners, self.radius)  # Same graph as nx.random_geometric_graph, without comparing every pair of miners.
+                        if self.connectivity == Connectivity.LARGEST_COMPONENT:
+                            graph = geometric_graph.largestComponent(graph)
+                        elif self.connectivity == Connectivity.BRIDGE:
+                            geometric_graph.bridgeComponents(graph)
                     elif self.topology_type == TopologyType.LOBSTER_UNIFORM_DELAY:
                         graph = nx.random_lobster(self.number_of_miners, self.p1, self.p2)
                 else:
                     raise NotImplementedError("Selected topology type is not implemented.")
-
-        for edge in graph.edges:
-            graph.edges[edge]['network_delay'] = self.network_delay
+            logging.info("Generated a connected graph of %d miners in %d attempt(s)" % (graph.number_of_nodes(), self.attempts))
         return graph
 
     def __str__(self):
@@ -0,0 +1,62 @@
+import random
+
+
+class WeightedSampler:
+    """Weighted random choice over a fixed list of choices, backed by a Fenwick (binary indexed) tree of the weights.
+    Sampling and changing a weight both take O(log n), so weights can change during a run without rebuilding anything.
+    """
+
+    def __init__(self, choices, weights):
+        """Builds the tree in O(n).
+
+        Arguments:
+            choices {list} -- Choices to sample from.
+            weights {list(float)} -- Non-negative weight of each choice.
+        """
+
+        assert len(choices) == len(weights) and choices
+        self.choices = list(choices)
+        self.weights = list(weights)
+        self.tree = [0] + self.weights  # 1-based; tree[i] holds the sum of weights (i - lowbit(i), i].
+        for i in xrange(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+        self.total = sum(self.weights)
+        self.top_step = 1  # Largest power of two <= number of choices.
+        while self.top_step * 2 <= len(self.choices):
+            self.top_step *= 2
+
+    def sample(self):
+        """Selects a choice with probability proportional to its weight, using one draw from the random module.
+
+        Returns:
+            any -- The first choice whose cumulative weight reaches a uniformly drawn target.
+        """
+
+        remaining = random.uniform(0, self.total)
+        position = 0
+        step = self.top_step
+        while step:
+            next_position = position + step
+            if next_position < len(self.tree) and self.tree[next_position] < remaining:
+                position = next_position
+                remaining -= self.tree[position]
+            step >>= 1
+        return self.choices[min(position, len(self.choices) - 1)]  # Rounding can push a target equal to the total one past the end.
+
+    def update(self, index, weight):
+        """Changes the weight of one choice.
+
+        Arguments:
+            index {int} -- Index of the choice in choices.
+            weight {float} -- New non-negative weight.
+        """
+
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        self.total += delta
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i